@@ -0,0 +1,212 @@
+from argparse import ArgumentParser
+import csv
+import glob
+import multiprocessing as mp
+from multiprocessing.connection import wait
+import os
+import time
+import numpy as np
+import cv2 as cv
+
+from map_cache import file_hash
+from path_artifact import save_path
+from planning import WarmMap, plan_path, planner_names
+from rrtstar import draw_path
+
+# columns of summary.csv, one row per map
+fields = [
+    "map",
+    "status",
+    "seconds",
+    "load",
+    "plan",
+    "post_process",
+    "cost",
+    "length",
+    "vertices",
+    "expected_tics",
+    "min_clearance",
+    "seed",
+    "error",
+]
+
+
+# plans one map in a worker process and sends its summary row over `conn`:
+# the path artifact goes to <out_dir>/<name>/ and a preview with the path
+# drawn on the map to <out_dir>/<name>.png
+def plan_one(map_file, out_dir, seed, options, cache_dir, conn):
+    name = os.path.splitext(os.path.basename(map_file))[0]
+    row = {"map": map_file, "seed": seed}
+    t = time.perf_counter()
+    try:
+        np.random.seed(seed)
+        warm = WarmMap(map_file, cache_dir)
+        t_plan = time.perf_counter()
+        result = plan_path(warm, **options)
+        if result is None:
+            row["status"] = "no_path"
+        else:
+            pixels = result.pop("pixels")
+            result.pop("game")
+            cost = result.pop("best_cost")
+            timing = dict(result.pop("timing"), load=t_plan - t)
+            save_path(
+                os.path.join(out_dir, name),
+                pixels,
+                warm.key,
+                settings=options,
+                seed=seed,
+                timing=timing,
+                **result,
+            )
+            preview = np.array(warm.maze)
+            draw_path(preview, pixels, (0, 0, 255))
+            cv.imwrite(os.path.join(out_dir, name + ".png"), preview)
+            row.update(
+                status="ok",
+                cost=cost,
+                length=float(result["arc_length"][-1]),
+                vertices=len(pixels),
+                expected_tics=float(result["segment_tics"].sum()),
+                min_clearance=float(result["clearance"].min()),
+                **timing,
+            )
+    except Exception as e:
+        row.update(status="error", error=f"{type(e).__name__}: {e}")
+    row["seconds"] = time.perf_counter() - t
+    conn.send(row)
+    conn.close()
+
+
+# plans every map with at most `workers` worker processes, one process per
+# map so a map that runs over `timeout` seconds can be killed on its own.
+# the map caches go to `cache_dir` (default .map_cache next to each map).
+# copies of one image share a cache bundle, so they are never planned at
+# the same time, the first one builds the bundle and the others load it.
+# returns the summary rows in the order of `maps`
+def plan_maps(
+    maps, out_dir, workers=None, timeout=None, seed=0, options=None, cache_dir=None
+):
+    workers = workers or os.cpu_count()
+    options = options or {}
+    ctx = mp.get_context()
+    keys = [file_hash(map_file) for map_file in maps]
+    pending = list(enumerate(maps))
+    running = {}
+    rows = [None] * len(maps)
+    while pending or running:
+        busy = {keys[i] for i, _, _, _ in running.values()}
+        while len(running) < workers:
+            ready = [k for k, (i, _) in enumerate(pending) if keys[i] not in busy]
+            if not ready:
+                break
+            i, map_file = pending.pop(ready[0])
+            busy.add(keys[i])
+            receiver, sender = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=plan_one,
+                args=(map_file, out_dir, seed + i, options, cache_dir, sender),
+            )
+            process.start()
+            sender.close()
+            running[receiver] = (i, map_file, process, time.perf_counter())
+
+        for receiver in wait(list(running), timeout=0.1):
+            i, map_file, process, _ = running.pop(receiver)
+            try:
+                rows[i] = receiver.recv()
+            except EOFError:
+                # the worker died before it could report
+                rows[i] = {"map": map_file, "status": "error", "seed": seed + i}
+                rows[i]["error"] = f"worker exited with code {process.exitcode}"
+            process.join()
+
+        now = time.perf_counter()
+        for receiver, (i, map_file, process, started) in list(running.items()):
+            if timeout is not None and now - started > timeout:
+                process.kill()
+                process.join()
+                del running[receiver]
+                rows[i] = {
+                    "map": map_file,
+                    "status": "timeout",
+                    "seconds": now - started,
+                    "seed": seed + i,
+                }
+    return rows
+
+
+def write_summary(rows, filename):
+    with open(filename, "w", newline="") as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({k: row.get(k) for k in fields})
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Plan paths for every map image in a directory.")
+    parser.add_argument("maps", help="directory of automap images")
+    parser.add_argument("--pattern", default="*.png")
+    parser.add_argument(
+        "--out",
+        default="batch_paths",
+        help="directory for the path artifacts, previews and summary.csv",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument(
+        "--cache-dir", default=None, help="map cache, default .map_cache in maps"
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=60, help="seconds per map before it is killed"
+    )
+    parser.add_argument("--planner", choices=planner_names, default="thetastar")
+    parser.add_argument("--max-iter", type=int, default=10000)
+    parser.add_argument("--sampler", default="uniform")
+    parser.add_argument(
+        "--attempts", type=int, default=3, help="tries of the sampling planners"
+    )
+    parser.add_argument("--clearance", type=float, default=6)
+    parser.add_argument("--spacing", type=float, default=10)
+    parser.add_argument(
+        "--seed", type=int, default=0, help="the n-th map is planned with seed + n"
+    )
+    args = parser.parse_args()
+
+    out_dir = os.path.abspath(args.out)
+    maps = [
+        f
+        for f in sorted(glob.glob(os.path.join(args.maps, args.pattern)))
+        if os.path.dirname(os.path.abspath(f)) != out_dir
+    ]
+    if not maps:
+        parser.error(f"no {args.pattern} files in {args.maps}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    options = dict(
+        planner=args.planner,
+        clearance=args.clearance,
+        spacing=args.spacing,
+    )
+    if args.planner in ("rrtstar", "birrtstar"):
+        options.update(
+            max_iter=args.max_iter, sampler=args.sampler, attempts=args.attempts
+        )
+    t = time.perf_counter()
+    rows = plan_maps(
+        maps, out_dir, args.workers, args.timeout, args.seed, options, args.cache_dir
+    )
+    write_summary(rows, os.path.join(out_dir, "summary.csv"))
+
+    for row in rows:
+        line = f"{os.path.basename(row['map']):<30} {row['status']:<8}"
+        if row["status"] == "ok":
+            line += f" {row['seconds']:7.2f}s  length {row['length']:.0f}"
+        elif row.get("error"):
+            line += f" {row['error']}"
+        print(line)
+    found = [row for row in rows if row["status"] == "ok"]
+    print(
+        f"{len(found)}/{len(rows)} maps planned in {time.perf_counter() - t:.1f}s, "
+        f"summary in {os.path.join(out_dir, 'summary.csv')}"
+    )
@@ -0,0 +1,53 @@
+from argparse import ArgumentParser
+import time
+import numpy as np
+
+from birrtstar import BiRRTStar
+from rrtstar import RRTStar, load_map
+
+planners = {"rrtstar": RRTStar, "birrtstar": BiRRTStar}
+
+
+# runs each planner once per seed on the same map, first solution only
+def compare(maze, start, goal, seeds, max_iter):
+    results = {}
+    for name, planner_class in planners.items():
+        times, costs = [], []
+        for seed in seeds:
+            np.random.seed(seed)
+            planner = planner_class(maze, start, goal, max_iter=max_iter)
+            t = time.perf_counter()
+            path = planner.run()
+            times.append(time.perf_counter() - t)
+            costs.append(planner.best_cost() if path is not None else np.nan)
+        results[name] = (np.array(times), np.array(costs))
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Compare the one-tree and bidirectional planners.")
+    parser.add_argument("--map", default="map.png")
+    parser.add_argument("--seeds", type=int, default=20)
+    parser.add_argument("--max-iter", type=int, default=10000)
+    args = parser.parse_args()
+
+    maze_img, start, goal = load_map(args.map)
+    results = compare(maze_img, start, goal, range(args.seeds), args.max_iter)
+
+    print(
+        "planner".ljust(12)
+        + "success".rjust(10)
+        + "mean s".rjust(10)
+        + "median s".rjust(10)
+        + "mean cost".rjust(12)
+    )
+    for name, (times, costs) in results.items():
+        found = ~np.isnan(costs)
+        mean_cost = costs[found].mean() if found.any() else np.nan
+        print(
+            name.ljust(12)
+            + f"{found.mean():10.0%}"
+            + f"{times.mean():10.2f}"
+            + f"{np.median(times):10.2f}"
+            + f"{mean_cost:12.1f}"
+        )
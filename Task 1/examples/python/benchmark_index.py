@@ -0,0 +1,52 @@
+from argparse import ArgumentParser
+import time
+import numpy as np
+
+from rrtstar import RRTStar
+
+
+# grows an rrt tree on an empty map of the given shape and measures
+# iterations per second of the index-bound part of an rrt* iteration
+# (sample, nearest, steer, near set, insert) as the tree gets bigger
+def grow(index, shape, n_nodes, report_every, seed):
+    np.random.seed(seed)
+    maze = np.zeros(shape + (3,), dtype=np.uint8)
+    start = (shape[1] // 2, shape[0] // 2)
+    rrt = RRTStar(maze, start, start, max_iter=n_nodes, index=index)
+
+    rates = []
+    t = time.perf_counter()
+    while rrt.n_nodes < n_nodes:
+        q_rand = rrt.sample_random()
+        i_near = rrt.find_nearest(q_rand)
+        q_new = rrt.steer(rrt.node(i_near), q_rand)
+        rrt.find_near_nodes(q_new)
+        rrt.add_node(q_new, i_near)
+        if rrt.n_nodes % report_every == 0:
+            now = time.perf_counter()
+            rates.append(report_every / (now - t))
+            t = now
+    return rates
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Iterations per second against tree size per index.")
+    parser.add_argument("--nodes", type=int, default=20000)
+    parser.add_argument("--every", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--indexes", nargs="+", default=["brute", "grid", "kdtree"])
+    args = parser.parse_args()
+
+    results = {}
+    for index in args.indexes:
+        results[index] = grow(
+            index, (args.height, args.width), args.nodes, args.every, args.seed
+        )
+
+    print("tree size".rjust(10) + "".join(k.rjust(12) for k in args.indexes))
+    for row in range(args.nodes // args.every):
+        size = (row + 1) * args.every
+        rates = "".join(f"{results[k][row]:12.0f}" for k in args.indexes)
+        print(f"{size:10d}" + rates)
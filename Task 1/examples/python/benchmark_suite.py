@@ -0,0 +1,207 @@
+from argparse import ArgumentParser
+import json
+import multiprocessing as mp
+import platform
+import subprocess
+import time
+import numpy as np
+
+from birrtstar import BiRRTStar
+from grid_planner import GridPlanner
+from maze_generator import generate_maze
+from prm import PRMPlanner
+from rrtstar import RRTStar
+
+try:
+    import resource
+except ImportError:
+    # no resource module on windows, memory is reported as None there
+    resource = None
+
+# name -> (planner class, extra arguments, takes max_iter)
+configs = {
+    "rrtstar": (RRTStar, {}, True),
+    "rrtstar-lazy": (RRTStar, {"lazy": True}, True),
+    "rrtstar-bridge": (RRTStar, {"sampler": "bridge"}, True),
+    "birrtstar": (BiRRTStar, {}, True),
+    "astar": (GridPlanner, {}, False),
+    "thetastar": (GridPlanner, {"any_angle": True}, False),
+    # each run already has its own process, no nested pool for the roadmap
+    "prm": (PRMPlanner, {"workers": 1}, False),
+}
+
+
+def peak_mb():
+    if resource is None:
+        return None
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# one planner on one generated map, in a fresh worker process so the memory
+# peak belongs to this run alone. the time includes building the planner
+# (obstacle bitmap, roadmap) and runs up to the first solution
+def run_one(name, width, height, density, seed, max_iter):
+    planner_class, kwargs, iterative = configs[name]
+    if iterative:
+        kwargs = dict(kwargs, max_iter=max_iter)
+    maze, start, goal = generate_maze(width, height, density=density, seed=seed)
+    np.random.seed(seed)
+    before = peak_mb()
+
+    t = time.perf_counter()
+    planner = planner_class(maze, start, goal, **kwargs)
+    path = planner.run()
+    elapsed = time.perf_counter() - t
+
+    after = peak_mb()
+    return {
+        "planner": name,
+        "width": width,
+        "height": height,
+        "density": density,
+        "seed": seed,
+        "success": path is not None,
+        "time": elapsed,
+        "length": float(planner.best_cost()) if path is not None else None,
+        "iterations": getattr(planner, "n_iter", None),
+        "peak_mb": after,
+        "memory_mb": None if after is None else after - before,
+    }
+
+
+# success rate and means over the seeds of every (planner, size, density)
+def summarize(runs):
+    groups = {}
+    for run in runs:
+        key = (run["planner"], run["width"], run["height"], run["density"])
+        groups.setdefault(key, []).append(run)
+    summary = []
+    for (name, width, height, density), group in groups.items():
+        found = [run for run in group if run["success"]]
+        iterations = [run["iterations"] for run in group if run["iterations"]]
+        memory = [run["memory_mb"] for run in group if run["memory_mb"] is not None]
+        summary.append(
+            {
+                "planner": name,
+                "width": width,
+                "height": height,
+                "density": density,
+                "runs": len(group),
+                "success_rate": len(found) / len(group),
+                "mean_time": (
+                    float(np.mean([run["time"] for run in found])) if found else None
+                ),
+                "mean_length": (
+                    float(np.mean([run["length"] for run in found])) if found else None
+                ),
+                "mean_iterations": float(np.mean(iterations)) if iterations else None,
+                "max_memory_mb": max(memory) if memory else None,
+            }
+        )
+    return summary
+
+
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def fmt(value, width, spec):
+    return ("-" if value is None else format(value, spec)).rjust(width)
+
+
+def print_summary(summary, baseline=None):
+    old = {}
+    if baseline is not None:
+        for row in baseline["summary"]:
+            key = (row["planner"], row["width"], row["height"], row["density"])
+            old[key] = row
+    print(
+        "planner".ljust(16)
+        + "size".rjust(10)
+        + "density".rjust(8)
+        + "success".rjust(9)
+        + "time s".rjust(9)
+        + "length".rjust(9)
+        + "iters".rjust(8)
+        + "mem MB".rjust(8)
+        + ("  vs baseline" if baseline is not None else "")
+    )
+    for row in summary:
+        line = (
+            row["planner"].ljust(16)
+            + f"{row['width']}x{row['height']}".rjust(10)
+            + f"{row['density']:8.2f}"
+            + f"{row['success_rate']:9.0%}"
+            + fmt(row["mean_time"], 9, ".3f")
+            + fmt(row["mean_length"], 9, ".1f")
+            + fmt(row["mean_iterations"], 8, ".0f")
+            + fmt(row["max_memory_mb"], 8, ".1f")
+        )
+        key = (row["planner"], row["width"], row["height"], row["density"])
+        before = old.get(key)
+        if before is not None and before["mean_time"] and row["mean_time"]:
+            line += f"  time x{row['mean_time'] / before['mean_time']:.2f}"
+            line += f", success {row['success_rate'] - before['success_rate']:+.0%}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Run every planner over generated maps.")
+    parser.add_argument(
+        "--planners", default=",".join(configs), help="comma separated names"
+    )
+    parser.add_argument("--sizes", default="320x240,640x480,1280x960")
+    parser.add_argument("--densities", default="0.2,0.5,0.8")
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--max-iter", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument(
+        "--baseline",
+        default=None,
+        help="results file of an earlier run to compare against",
+    )
+    args = parser.parse_args()
+
+    names = args.planners.split(",")
+    for name in names:
+        if name not in configs:
+            parser.error(f"unknown planner {name!r}, expected one of {list(configs)}")
+    sizes = [tuple(int(v) for v in size.split("x")) for size in args.sizes.split(",")]
+    densities = [float(d) for d in args.densities.split(",")]
+
+    jobs = [
+        (name, width, height, density, seed, args.max_iter)
+        for name in names
+        for width, height in sizes
+        for density in densities
+        for seed in range(args.seeds)
+    ]
+    # a fresh process per run, ProcessPoolExecutor only recycles workers
+    # from python 3.11 on
+    with mp.get_context().Pool(args.workers, maxtasksperchild=1) as pool:
+        runs = pool.starmap(run_one, jobs)
+
+    summary = summarize(runs)
+    results = {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "max_iter": args.max_iter,
+        "summary": summary,
+        "runs": runs,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
@@ -0,0 +1,138 @@
+import time
+import numpy as np
+
+from collision import CollisionChecker
+from rrtstar import RRTStar
+
+
+# bidirectional rrt*-connect: one rrt* tree grows from the start, one from
+# the goal. every iteration the active tree takes an rrt* step towards a
+# sample and the other tree greedily extends towards the new node; if it
+# gets there the two trees are joined. the trees swap roles each iteration.
+# same run() contract as RRTStar, the constructor has no goal_visible, lazy
+# or cost_model: there is no goal test, no lazy validation of the joined
+# path and no turn cost where the two halves meet
+class BiRRTStar:
+    def __init__(
+        self,
+        maze,
+        start,
+        goal,
+        max_iter=10000,
+        max_dist=10,
+        goal_sample_rate=0.2,
+        search_radius=30,
+        index="grid",
+        sampler="uniform",
+        robot_radius=1,
+        collision=None,
+        anytime=False,
+        time_budget=None,
+        visualizer=None,
+        should_stop=None,
+        stats=None,
+        free_ids=None,
+    ):
+        self.maze = maze
+        self.start = start
+        self.goal = goal
+        self.max_iter = max_iter
+        self.anytime = anytime
+        self.time_budget = time_budget
+        self.should_stop = should_stop
+        # why the last run() found no path, None if it found one
+        self.status = None
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        self.collision = collision
+        # both trees draw from the same free pixels
+        if sampler == "free" and free_ids is None:
+            free_ids = np.flatnonzero(~np.asarray(collision.occupancy).ravel())
+
+        tree_args = dict(
+            max_iter=max_iter,
+            max_dist=max_dist,
+            goal_sample_rate=goal_sample_rate,
+            search_radius=search_radius,
+            index=index,
+            sampler=sampler,
+            collision=collision,
+            visualizer=visualizer,
+            stats=stats,
+            free_ids=free_ids,
+        )
+        self.trees = [
+            RRTStar(maze, start, goal, **tree_args),
+            RRTStar(maze, goal, start, **tree_args),
+        ]
+        # best connection so far: node ids in the start and goal tree that
+        # sit on the same point
+        self.connection = None
+        self.c_best = np.inf
+        self.n_iter = 0
+        # the trees time their own phases, this adds run and sampling
+        if stats is not None:
+            stats.attach(self)
+
+    def run(self):
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+
+        active = 0
+        for _ in range(self.max_iter):
+            self.n_iter += 1
+            if self.time_budget is not None and time.perf_counter() > deadline:
+                break
+            if self.should_stop is not None and self.should_stop():
+                break
+
+            tree, other = self.trees[active], self.trees[1 - active]
+            i_new = tree.extend(self.sample(tree))
+            if i_new >= 0:
+                q_new = tree.node(i_new)
+                j = self.connect(other, q_new)
+                if j >= 0:
+                    ids = (i_new, j) if active == 0 else (j, i_new)
+                    c = tree.cost(i_new) + other.cost(j)
+                    if c < self.c_best:
+                        self.connection = ids
+                        self.c_best = c
+                    if not self.anytime:
+                        break
+            active = 1 - active
+
+        if self.connection is None:
+            sizes = [t.n_nodes for t in self.trees]
+            self.status = f"trees with {sizes} nodes, no path"
+            return None
+        i, j = self.connection
+        start_half = self.trees[0].path_to(i)
+        goal_half = self.trees[1].path_to(j)
+        return start_half + goal_half[::-1][1:]
+
+    def best_cost(self):
+        return self.c_best
+
+    @property
+    def n_nodes(self):
+        return sum(t.n_nodes for t in self.trees)
+
+    def sample(self, tree):
+        if self.connection is not None:
+            return self.trees[0].sample_informed(self.c_best)
+        # the goal bias pulls each tree towards the root of the other one
+        if np.random.uniform() < tree.goal_sample_rate:
+            return tree.goal
+        return tree.sample_random()
+
+    # grows `tree` step by step straight towards q, returns the id of the
+    # node that reached q or -1 if a wall was hit first
+    def connect(self, tree, q):
+        n_steps = int(tree.dist(tree.node(tree.find_nearest(q)), q) / tree.max_dist)
+        for _ in range(n_steps + 2):
+            i = tree.extend(q)
+            if i < 0:
+                return -1
+            if tree.node(i) == q:
+                return i
+        return -1
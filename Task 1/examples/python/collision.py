@@ -0,0 +1,108 @@
+import numpy as np
+import cv2 as cv
+
+brown_colour = [11, 27, 47]  # in bgr
+
+
+def wall_mask(maze):
+    return (maze == brown_colour).all(axis=-1)
+
+
+def disk_kernel(radius):
+    r = int(radius)
+    yy, xx = np.mgrid[-r : r + 1, -r : r + 1]
+    return (xx**2 + yy**2 <= (radius + 0.5) ** 2).astype(np.uint8)
+
+
+# boolean obstacle bitmap of the map, walls grown by the robot radius.
+# a radius of 1 gives the 3x3 window the planner used to check per pixel
+def obstacle_map(maze, robot_radius=1):
+    walls = wall_mask(maze)
+    if robot_radius <= 0:
+        return walls
+    grown = cv.dilate(walls.astype(np.uint8), disk_kernel(robot_radius))
+    return grown.astype(bool)
+
+
+class CollisionChecker:
+    def __init__(self, occupancy):
+        self.occupancy = occupancy
+        self.height, self.width = occupancy.shape
+
+    @classmethod
+    def from_maze(cls, maze, robot_radius=1):
+        return cls(obstacle_map(maze, robot_radius))
+
+    def is_free(self, q):
+        x, y = int(q[0]), int(q[1])
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return not self.occupancy[y, x]
+
+    # single segment version of segments_free below, same pixels without the
+    # batching overhead
+    def segment_free(self, q0, q1):
+        x0, y0 = int(q0[0]), int(q0[1])
+        x1, y1 = int(q1[0]), int(q1[1])
+        if (x1, y1) < (x0, y0):
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        if not (self.is_inside(x0, y0) and self.is_inside(x1, y1)):
+            return False
+
+        dx, dy = x1 - x0, y1 - y0
+        steps = max(abs(dx), abs(dy))
+        t = np.arange(steps + 1)
+        div = max(steps, 1)
+        xs = x0 + (t * dx / div).astype(np.int64)
+        ys = y0 + (t * dy / div).astype(np.int64)
+        return not self.occupancy[ys, xs].any()
+
+    def is_inside(self, x, y):
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    # checks the segments p0[k] -> p1[k] (p1 may be a single point) with one
+    # gather over all their rasterized pixels
+    def segments_free(self, p0, p1):
+        xs, ys = rasterize(p0, p1)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        hit = self.occupancy[
+            np.clip(ys, 0, self.height - 1), np.clip(xs, 0, self.width - 1)
+        ]
+        return ~(hit | ~inside).any(axis=1)
+
+    # boolean mask of the pixels with a collision free segment to q, one
+    # segment per free pixel cast from q in batches. pixels are batched by
+    # distance to q so the segments of a batch have about the same length
+    def visible_from(self, q, batch=8192):
+        visible = np.zeros((self.height, self.width), dtype=bool)
+        if not self.is_free(q):
+            return visible
+        ys, xs = np.nonzero(~np.asarray(self.occupancy))
+        order = np.argsort(np.maximum(np.abs(xs - q[0]), np.abs(ys - q[1])))
+        xs, ys = xs[order], ys[order]
+        for k in range(0, len(xs), batch):
+            x, y = xs[k : k + batch], ys[k : k + batch]
+            visible[y, x] = self.segments_free(np.stack([x, y], axis=1), q)
+        return visible
+
+
+# pixels of the segments p0[k] -> p1[k] as two (n, steps) arrays. pixels are
+# stepped the same way the planner always did, x0 + int(i * dx / steps) for
+# i in 0..steps, but always from the smaller end point so a->b and b->a give
+# the same pixels. shorter segments repeat their end point
+def rasterize(p0, p1):
+    p0 = np.asarray(p0, dtype=np.int64).reshape(-1, 2)
+    p1 = np.broadcast_to(np.asarray(p1, dtype=np.int64), p0.shape)
+    if len(p0) == 0:
+        return np.zeros((0, 1), dtype=np.int64), np.zeros((0, 1), dtype=np.int64)
+    swap = (p1[:, 0] < p0[:, 0]) | ((p1[:, 0] == p0[:, 0]) & (p1[:, 1] < p0[:, 1]))
+    p0, p1 = np.where(swap[:, None], p1, p0), np.where(swap[:, None], p0, p1)
+
+    delta = p1 - p0
+    steps = np.abs(delta).max(axis=1)
+    t = np.arange(0, int(steps.max()) + 1)
+    t = np.minimum(t[None, :], steps[:, None])
+    div = np.maximum(steps, 1)[:, None]
+    xs = p0[:, :1] + (t * delta[:, :1] / div).astype(np.int64)
+    ys = p0[:, 1:] + (t * delta[:, 1:] / div).astype(np.int64)
+    return xs, ys
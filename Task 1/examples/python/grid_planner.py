@@ -0,0 +1,152 @@
+from heapq import heappop, heappush
+import math
+import numpy as np
+
+from collision import CollisionChecker
+
+sqrt2 = math.sqrt(2)
+# (dx, dy, step cost) of the 8 grid neighbours
+moves = [
+    (1, 0, 1.0),
+    (-1, 0, 1.0),
+    (0, 1, 1.0),
+    (0, -1, 1.0),
+    (1, 1, sqrt2),
+    (1, -1, sqrt2),
+    (-1, 1, sqrt2),
+    (-1, -1, sqrt2),
+]
+
+
+def octile(dx, dy):
+    dx, dy = abs(dx), abs(dy)
+    return dx + dy + (sqrt2 - 2) * min(dx, dy)
+
+
+def euclidean(dx, dy):
+    return math.sqrt(dx * dx + dy * dy)
+
+
+# deterministic search over the obstacle bitmap. plain A* on the 8-connected
+# grid with the octile heuristic, or with any_angle=True Lazy Theta*, which
+# lets a node take its grandparent as parent whenever the two can see each
+# other, giving any-angle paths. the open list is a binary heap and g values,
+# parents and the closed set are flat arrays over all pixels.
+# same constructor and run() contract as RRTStar, returns None if the goal
+# can't be reached
+class GridPlanner:
+    def __init__(
+        self, maze, start, goal, any_angle=False, robot_radius=1, collision=None
+    ):
+        self.maze = maze
+        self.start = (int(start[0]), int(start[1]))
+        self.goal = (int(goal[0]), int(goal[1]))
+        self.any_angle = any_angle
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        self.collision = collision
+        self.cost = np.inf
+        # why the last run() found no path, None if it found one
+        self.status = None
+
+    def run(self):
+        occupancy = self.collision.occupancy
+        h, w = occupancy.shape
+        blocked = bytearray(occupancy.ravel().tobytes())
+        closed = bytearray(h * w)
+        g = [math.inf] * (h * w)
+        parent = [-1] * (h * w)
+
+        sx, sy = self.start
+        gx, gy = self.goal
+        s0, goal = sy * w + sx, gy * w + gx
+        if blocked[s0] or blocked[goal]:
+            self.status = "start or goal inside a wall"
+            return None
+        # octile overestimates any-angle distances, theta* needs euclidean
+        heuristic = euclidean if self.any_angle else octile
+
+        g[s0] = 0.0
+        parent[s0] = s0
+        open_list = [(heuristic(gx - sx, gy - sy), s0)]
+        while open_list:
+            _, s = heappop(open_list)
+            if closed[s]:
+                continue
+            y, x = divmod(s, w)
+            if self.any_angle and not self.line_of_sight(parent[s], s, w):
+                self.closest_parent(s, x, y, w, h, closed, g, parent)
+            closed[s] = 1
+            if s == goal:
+                break
+
+            for dx, dy, step in moves:
+                nx, ny = x + dx, y + dy
+                if not (0 <= nx < w and 0 <= ny < h):
+                    continue
+                n = ny * w + nx
+                if closed[n] or blocked[n]:
+                    continue
+                # no cutting corners between two blocked pixels
+                if dx and dy and (blocked[y * w + nx] or blocked[ny * w + x]):
+                    continue
+                if self.any_angle:
+                    # lazy theta*: assume the grandparent can see n and
+                    # only check once n gets expanded
+                    p = parent[s]
+                    py, px = divmod(p, w)
+                    c = g[p] + euclidean(nx - px, ny - py)
+                else:
+                    p = s
+                    c = g[s] + step
+                if c < g[n]:
+                    g[n] = c
+                    parent[n] = p
+                    heappush(open_list, (c + heuristic(gx - nx, gy - ny), n))
+
+        if not closed[goal]:
+            self.status = "no path"
+            return None
+        self.cost = g[goal]
+
+        path = [goal]
+        while path[-1] != s0:
+            path.append(parent[path[-1]])
+        path = [(s % w, s // w) for s in reversed(path)]
+        if not self.any_angle:
+            path = merge_straight(path)
+        return path
+
+    def best_cost(self):
+        return self.cost
+
+    def line_of_sight(self, a, b, w):
+        ay, ax = divmod(a, w)
+        by, bx = divmod(b, w)
+        # neighbours were already checked when b was generated
+        if abs(ax - bx) <= 1 and abs(ay - by) <= 1:
+            return True
+        return self.collision.segment_free((ax, ay), (bx, by))
+
+    # fallback when the assumed parent can't see s: best closed grid neighbour
+    def closest_parent(self, s, x, y, w, h, closed, g, parent):
+        g[s] = math.inf
+        for dx, dy, step in moves:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < w and 0 <= ny < h):
+                continue
+            n = ny * w + nx
+            if closed[n] and g[n] + step < g[s]:
+                g[s] = g[n] + step
+                parent[s] = n
+
+
+# drops the vertices in the middle of straight runs of grid moves
+def merge_straight(path):
+    if len(path) < 3:
+        return path
+    pts = np.array(path)
+    d = np.diff(pts, axis=0)
+    turn = (d[1:] != d[:-1]).any(axis=1)
+    keep = np.concatenate([[True], turn, [True]])
+    return [path[i] for i in np.flatnonzero(keep)]
@@ -0,0 +1,121 @@
+import time
+import numpy as np
+import cv2 as cv
+
+from collision import CollisionChecker, rasterize
+from rrtstar import RRTStar
+
+
+# occupancy bitmaps at 1/1, 1/2, 1/4, ... resolution. a coarse pixel is
+# blocked when at least half of the pixels it covers are, any pooling would
+# close the narrow doors of the automap and all pooling drops whole walls
+def occupancy_pyramid(occupancy, levels):
+    pyramid = [np.asarray(occupancy)]
+    for _ in range(levels - 1):
+        occ = pyramid[-1]
+        h, w = occ.shape
+        padded = np.zeros((h + h % 2, w + w % 2), dtype=bool)
+        padded[:h, :w] = occ
+        blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+        pyramid.append(blocks.sum(axis=(1, 3)) >= 2)
+    return pyramid
+
+
+# pixels within `width` of the path, as a mask of the given shape
+def corridor_mask(path, shape, width):
+    pts = np.asarray(path, dtype=np.int64)
+    xs, ys = rasterize(pts[:-1], pts[1:])
+    mask = np.zeros(shape, dtype=np.uint8)
+    inside = (xs >= 0) & (xs < shape[1]) & (ys >= 0) & (ys < shape[0])
+    mask[ys[inside], xs[inside]] = 1
+    size = 2 * int(width) + 1
+    kernel = cv.getStructuringElement(cv.MORPH_ELLIPSE, (size, size))
+    return cv.dilate(mask, kernel).astype(bool)
+
+
+# whether start and goal lie free in the same 8-connected free region of occ
+def connected(occ, start, goal):
+    _, labels = cv.connectedComponents((~occ).astype(np.uint8), connectivity=8)
+    a, b = labels[start[1], start[0]], labels[goal[1], goal[0]]
+    return a != 0 and a == b
+
+
+# coarse-to-fine planning on an occupancy pyramid: `planner` (any class with
+# the RRTStar constructor and run() contract) plans on the coarsest level
+# first, every finer level only plans inside a corridor of `corridor`
+# pixels around the previous path scaled up, everything outside it counts
+# as blocked. a level that fails inside its corridor is planned again on
+# the whole level, and a coarse level whose start or goal is blocked, or
+# where pooling cut them apart, is skipped. `self.level_stats` has (level,
+# seconds, tree nodes, collision checks) per level, None for the counts a
+# planner doesn't keep
+class HierarchicalPlanner:
+    def __init__(
+        self,
+        maze,
+        start,
+        goal,
+        levels=3,
+        corridor=8,
+        planner=RRTStar,
+        robot_radius=1,
+        collision=None,
+        **kwargs,
+    ):
+        self.start = (int(start[0]), int(start[1]))
+        self.goal = (int(goal[0]), int(goal[1]))
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        self.collision = collision
+        self.levels = levels
+        self.corridor = corridor
+        self.planner = planner
+        self.kwargs = kwargs
+        self.cost = np.inf
+        self.level_stats = []
+
+    def run(self):
+        pyramid = occupancy_pyramid(self.collision.occupancy, self.levels)
+        path, path_level = None, None
+        for level in reversed(range(self.levels)):
+            f = 2**level
+            occ = pyramid[level]
+            start = (self.start[0] // f, self.start[1] // f)
+            goal = (self.goal[0] // f, self.goal[1] // f)
+            if level > 0 and not connected(occ, start, goal):
+                continue
+
+            result = None
+            if path is not None:
+                # centres of the coarse pixels at this level
+                k = 2 ** (path_level - level)
+                scaled = [(k * x + k // 2, k * y + k // 2) for x, y in path]
+                scaled[0], scaled[-1] = start, goal
+                inside = corridor_mask(scaled, occ.shape, self.corridor)
+                result = self.plan(level, occ | ~inside, start, goal)
+            if result is None:
+                result = self.plan(level, occ, start, goal)
+            if result is not None:
+                path, path_level = result, level
+        return path if path_level == 0 else None
+
+    def plan(self, level, occ, start, goal):
+        t = time.perf_counter()
+        planner = self.planner(
+            occ, start, goal, collision=CollisionChecker(occ), **self.kwargs
+        )
+        path = planner.run()
+        self.level_stats.append(
+            (
+                level,
+                time.perf_counter() - t,
+                getattr(planner, "n_nodes", None),
+                getattr(planner, "n_checks", None),
+            )
+        )
+        if path is not None and level == 0:
+            self.cost = planner.best_cost()
+        return path
+
+    def best_cost(self):
+        return self.cost
@@ -0,0 +1,75 @@
+import math
+import numpy as np
+
+# linear fit from automap pixels to game coordinates (y is flipped), found by
+# regression on points measured in level 1, see map_to_game in
+# path_artifact.py
+map_origin = np.array([448.94429, 206.82446])
+map_axis_scale = np.array([0.08839, -0.08888])
+# automap pixels per game unit, the mean of the two axes. y is flipped, so a
+# pixel heading is minus the game angle
+map_scale = float(np.abs(map_axis_scale).mean())
+
+
+# how many tics the player needs for a path when it turns in place and then
+# walks straight, like navigate in level1.py: `speed` automap pixels and
+# `turn_rate` degrees per tic. the defaults are doom's walking speed (8.33
+# units per tic) and keyboard turn speed (1280/65536 of a turn per tic), use
+# from_game to measure them instead
+class KinematicModel:
+    def __init__(self, speed=8.33 * map_scale, turn_rate=7.03, start_heading=None):
+        self.speed = speed
+        self.turn_rate = turn_rate
+        # heading of the player at the start in radians (pixel frame), None
+        # if the first turn is free
+        self.start_heading = start_heading
+
+    # tics for segments of the given lengths entered with heading_in and
+    # left with heading_out (radians, nan for no turn)
+    def tics(self, lengths, heading_in, heading_out):
+        turn = np.abs(np.angle(np.exp(1j * (np.asarray(heading_out) - heading_in))))
+        turn = np.nan_to_num(turn)
+        return np.asarray(lengths) / self.speed + np.degrees(turn) / self.turn_rate
+
+    # lower bound of the tics for a path of the given length
+    def min_tics(self, lengths):
+        return np.asarray(lengths) / self.speed
+
+    # longest path that can be walked in the given number of tics
+    def max_length(self, tics):
+        return tics * self.speed
+
+    # measures speed and turn rate in a running game: walks forward and
+    # turns for `tics` tics each with the level1.py buttons (MOVE_FORWARD is
+    # button 2, TURN_LEFT_RIGHT_DELTA button 4) and reads POSITION_X,
+    # POSITION_Y and ANGLE back. this moves the player, so it belongs at the
+    # start of a calibration episode
+    @classmethod
+    def from_game(cls, game, tics=20, turn=90):
+        x0, y0, a0 = game.get_state().game_variables[:3]
+        for _ in range(tics):
+            game.make_action([0, 0, 1, 0, 0])
+        x1, y1, a1 = game.get_state().game_variables[:3]
+        speed = math.hypot(x1 - x0, y1 - y0) / tics * map_scale
+
+        turned = 0.0
+        for _ in range(tics):
+            game.make_action([0, 0, 0, 0, turn])
+            a0, a1 = a1, game.get_state().game_variables[2]
+            turned += abs((a1 - a0 + 180) % 360 - 180)
+        return cls(speed, turned / tics, math.radians(-a1))
+
+
+def headings(path):
+    pts = np.asarray(path, dtype=float)
+    d = np.diff(pts, axis=0)
+    return np.arctan2(d[:, 1], d[:, 0])
+
+
+# expected tics of each segment of the path, the turn at its start included
+def time_parameterize(path, model):
+    out = headings(path)
+    start = np.nan if model.start_heading is None else model.start_heading
+    heading_in = np.concatenate([[start], out[:-1]])
+    lengths = np.hypot(*np.diff(np.asarray(path, dtype=float), axis=0).T)
+    return model.tics(lengths, heading_in, out)
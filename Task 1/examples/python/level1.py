@@ -6,15 +6,13 @@ import numpy as np
 import math
 import cv2 as cv
 
+from path_artifact import load_path, map_to_game
+
 # DEFAULT_CONFIG = os.path.join(vzd.scenarios_path, "deadly_corridor.cfg")
 DEFAULT_CONFIG = "github\ViZDoom\scenarios\level1.cfg"
-
-
-def map_to_game(q):
-    q = q - [448.94429, 206.82446]
-    q[:, 0] /= 0.08839
-    q[:, 1] /= -0.08888
-    return q
+# pixel path written by rrtstar.py before path artifacts, used when there is
+# no artifact directory
+legacy_path = "path.npz"
 
 
 def navigate(game, vars, target):
@@ -53,6 +51,19 @@ if __name__ == "__main__":
         " Please see "
         "../../scenarios/*cfg for more scenarios.",
     )
+    parser.add_argument(
+        "--path", default="path", help="path artifact written by rrtstar.py"
+    )
+    parser.add_argument(
+        "--map",
+        default="map.png",
+        help="map image the path must have been planned on, skipped if missing",
+    )
+    parser.add_argument(
+        "--server",
+        default=None,
+        help="address of a running plan_server.py to ask for the path instead",
+    )
 
     args = parser.parse_args()
 
@@ -133,11 +144,19 @@ if __name__ == "__main__":
         # Not needed for the first episode but the loop is nicer.
         game.new_episode()
 
-        # retrieve path from rrt star:
-        loaded_arrays = np.load("path.npz", allow_pickle=True)
-        path = loaded_arrays["path_arr"]
-        path = np.array(path).astype("float")
-        path = map_to_game(path)
+        # retrieve path from rrt star, already in game coordinates:
+        if args.server is not None:
+            from plan_server import PlanClient
+
+            with PlanClient(args.server) as client:
+                path = client.plan(args.map)["game"]
+        else:
+            map_file = args.map if os.path.exists(args.map) else None
+            if os.path.isdir(args.path) or not os.path.exists(legacy_path):
+                path = load_path(args.path, map_file).game
+            else:
+                # pixels only, there is no map hash to check it against
+                path = map_to_game(np.load(legacy_path)["path_arr"])
 
         # episode ends after you reach the key(end of game) or after a given time(300 seconds fixed in the config file)
         while not game.is_episode_finished():
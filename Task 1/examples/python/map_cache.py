@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
+import cv2 as cv
+
+from collision import CollisionChecker, obstacle_map, wall_mask
+from path_processing import ClearanceField
+
+# bump whenever what goes into a bundle or how it is computed changes,
+# bundles written by another version are rebuilt
+CACHE_VERSION = 1
+
+
+def file_hash(filename):
+    h = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def save_array(directory, name, arr):
+    # write to a temp file first so readers never see half a file
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".npy")
+    with os.fdopen(fd, "wb") as f:
+        np.save(f, arr)
+    os.replace(tmp, os.path.join(directory, name + ".npy"))
+
+
+# preprocessed products of one map image, stored as a directory of .npy
+# files plus meta.json under <cache_dir>/<sha256 of the image file>.
+# arrays are memory-mapped read-only on load, products that are missing
+# (e.g. a new robot radius) are computed once and added to the bundle
+class MapArtifacts:
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.key = meta["key"]
+        self.start = tuple(meta["start"])
+        self.goal = tuple(meta["goal"])
+        self.arrays = {}
+
+    def array(self, name, build=None):
+        if name not in self.arrays:
+            filename = os.path.join(self.directory, name + ".npy")
+            if not os.path.exists(filename):
+                save_array(self.directory, name, build())
+            self.arrays[name] = np.load(filename, mmap_mode="r")
+        return self.arrays[name]
+
+    @property
+    def maze(self):
+        return self.array("maze")
+
+    @property
+    def walls(self):
+        return self.array("walls", lambda: wall_mask(self.maze))
+
+    def occupancy(self, robot_radius=1):
+        return self.array(
+            f"occupancy_r{robot_radius}",
+            lambda: obstacle_map(self.maze, robot_radius),
+        )
+
+    def collision(self, robot_radius=1):
+        return CollisionChecker(self.occupancy(robot_radius))
+
+    # flat indices of the free pixels, what the "free" sampler draws from
+    def free_ids(self, robot_radius=1):
+        return self.array(
+            f"free_r{robot_radius}",
+            lambda: np.flatnonzero(~np.asarray(self.occupancy(robot_radius)).ravel()),
+        )
+
+    # pixels with a free line of sight to `goal` (default the map's goal)
+    def visibility(self, goal=None, robot_radius=1):
+        x, y = self.goal if goal is None else (int(goal[0]), int(goal[1]))
+        return self.array(
+            f"visible_r{robot_radius}_{x}_{y}",
+            lambda: self.collision(robot_radius).visible_from((x, y)),
+        )
+
+    @property
+    def distance(self):
+        return self.array(
+            "distance",
+            lambda: cv.distanceTransform((~self.walls).astype(np.uint8), cv.DIST_L2, 5),
+        )
+
+    def clearance(self):
+        grad = self.array("distance_grad", lambda: ClearanceField(self.distance).grad)
+        return ClearanceField(self.distance, grad)
+
+
+def build_bundle(filename, directory, key, radii):
+    maze = cv.imread(filename)
+    if maze is None:
+        raise FileNotFoundError(filename)
+    start_y, start_x = np.where((maze == [255, 255, 255]).all(axis=-1))
+    goal_y, goal_x = np.where((maze == [255, 0, 0]).all(axis=-1))
+    if len(start_x) == 0 or len(goal_x) == 0:
+        raise ValueError(f"{filename} has no white start or blue goal pixel")
+    meta = {
+        "version": CACHE_VERSION,
+        "key": key,
+        "source": os.path.basename(filename),
+        "shape": list(maze.shape),
+        "start": [int(start_x[0]), int(start_y[0])],
+        "goal": [int(goal_x[0]), int(goal_y[0])],
+    }
+
+    tmp = tempfile.mkdtemp(dir=os.path.dirname(directory))
+    save_array(tmp, "maze", maze)
+    artifacts = MapArtifacts(tmp, meta)
+    for r in radii:
+        artifacts.occupancy(r)
+    artifacts.clearance()
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    try:
+        os.replace(tmp, directory)
+    except OSError:
+        # another process finished the same bundle first
+        for name in os.listdir(tmp):
+            os.remove(os.path.join(tmp, name))
+        os.rmdir(tmp)
+
+
+# artifacts of the map image `filename`, built on the first call and
+# memory-mapped from <cache_dir> (default .map_cache next to the image) after
+def load_artifacts(filename, cache_dir=None, radii=(1,)):
+    if cache_dir is None:
+        cache_dir = os.path.join(
+            os.path.dirname(os.path.abspath(filename)), ".map_cache"
+        )
+    os.makedirs(cache_dir, exist_ok=True)
+    key = file_hash(filename)
+    directory = os.path.join(cache_dir, key)
+
+    meta = None
+    meta_file = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_file):
+        with open(meta_file) as f:
+            meta = json.load(f)
+        if meta.get("version") != CACHE_VERSION:
+            for name in os.listdir(directory):
+                os.remove(os.path.join(directory, name))
+            os.rmdir(directory)
+            meta = None
+    if meta is None:
+        build_bundle(filename, directory, key, radii)
+        with open(meta_file) as f:
+            meta = json.load(f)
+    return MapArtifacts(directory, meta)
@@ -0,0 +1,90 @@
+from argparse import ArgumentParser
+import numpy as np
+import cv2 as cv
+
+from collision import brown_colour
+
+
+# seeded synthetic map in the colours of the automap images load_map reads:
+# black floor, 1 pixel brown walls, a white start and a blue goal. the map
+# is a grid of `cell` pixel rooms. a randomized depth first search opens a
+# door of `door` pixels in the walls of a spanning tree of the rooms, so the
+# goal is always reachable, and every other inner wall stays closed with
+# probability `density` and gets a door otherwise (0 gives open plan rooms,
+# 1 a perfect maze). start and goal are the centres of two rooms far apart.
+# returns (maze, start, goal) like load_map
+def generate_maze(width=640, height=480, cell=40, density=0.5, door=14, seed=0):
+    rng = np.random.default_rng(seed)
+    nx, ny = width // cell, height // cell
+    x0, y0 = (width - nx * cell) // 2, (height - ny * cell) // 2
+
+    # open_east[y, x]: door between room (x, y) and (x + 1, y),
+    # open_south[y, x]: door between room (x, y) and (x, y + 1)
+    open_east = rng.random((ny, nx - 1)) >= density
+    open_south = rng.random((ny - 1, nx)) >= density
+    seen = np.zeros((ny, nx), dtype=bool)
+    stack = [(0, 0)]
+    seen[0, 0] = True
+    while stack:
+        x, y = stack[-1]
+        nexts = [
+            (x + dx, y + dy)
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+            if 0 <= x + dx < nx and 0 <= y + dy < ny and not seen[y + dy, x + dx]
+        ]
+        if not nexts:
+            stack.pop()
+            continue
+        x1, y1 = nexts[rng.integers(len(nexts))]
+        if y1 == y:
+            open_east[y, min(x, x1)] = True
+        else:
+            open_south[min(y, y1), x] = True
+        seen[y1, x1] = True
+        stack.append((x1, y1))
+
+    maze = np.zeros((height, width, 3), dtype=np.uint8)
+    colour = tuple(brown_colour)
+    cv.rectangle(maze, (x0, y0), (x0 + nx * cell - 1, y0 + ny * cell - 1), colour)
+    gap = (cell - door) // 2
+    for y in range(ny):
+        for x in range(nx):
+            px, py = x0 + (x + 1) * cell, y0 + y * cell
+            if x < nx - 1:
+                if open_east[y, x]:
+                    cv.line(maze, (px, py), (px, py + gap), colour)
+                    cv.line(maze, (px, py + cell - gap), (px, py + cell), colour)
+                else:
+                    cv.line(maze, (px, py), (px, py + cell), colour)
+            px, py = x0 + x * cell, y0 + (y + 1) * cell
+            if y < ny - 1:
+                if open_south[y, x]:
+                    cv.line(maze, (px, py), (px + gap, py), colour)
+                    cv.line(maze, (px + cell - gap, py), (px + cell, py), colour)
+                else:
+                    cv.line(maze, (px, py), (px + cell, py), colour)
+
+    # start in a room in the first column, goal in one in the last
+    sy, gy = rng.integers(ny, size=2)
+    start = (x0 + cell // 2, y0 + int(sy) * cell + cell // 2)
+    goal = (x0 + (nx - 1) * cell + cell // 2, y0 + int(gy) * cell + cell // 2)
+    maze[start[1], start[0]] = (255, 255, 255)
+    maze[goal[1], goal[0]] = (255, 0, 0)
+    return maze, start, goal
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Write a synthetic maze image for the planners.")
+    parser.add_argument("output")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--cell", type=int, default=40)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--door", type=int, default=14)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    maze, start, goal = generate_maze(
+        args.width, args.height, args.cell, args.density, args.door, args.seed
+    )
+    cv.imwrite(args.output, maze)
@@ -0,0 +1,226 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+import os
+import time
+import numpy as np
+
+from collision import CollisionChecker
+from rrtstar import RRTStar
+
+# filled in each worker process by attach()
+shared = {}
+
+
+def share(arr):
+    shm = SharedMemory(create=True, size=max(arr.nbytes, 1))
+    np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[:] = arr
+    return shm, (shm.name, arr.shape, arr.dtype.str)
+
+
+# moves the array arguments of kwargs (e.g. the goal visibility mask) to
+# shared memory. returns the other kwargs, the shared memory blocks and the
+# specs of the arrays by argument name
+def share_arrays(kwargs):
+    kwargs, shms, specs = dict(kwargs), [], {}
+    for key, value in list(kwargs.items()):
+        if isinstance(value, np.ndarray):
+            shm, specs[key] = share(np.ascontiguousarray(value))
+            shms.append(shm)
+            del kwargs[key]
+    return kwargs, shms, specs
+
+
+# pool initializer: maps the shared arrays. `kwargs` are the planner
+# arguments, pickled once per worker instead of once per query, the arrays
+# of `array_specs` are added to them as views of shared memory
+def attach(maze_spec, occupancy_spec, stop=None, kwargs=None, array_specs=None):
+    array_specs = array_specs or {}
+    specs = dict(array_specs, maze=maze_spec, occupancy=occupancy_spec)
+    for key, (name, shape, dtype) in specs.items():
+        shm = SharedMemory(name=name)
+        shared[key + "_shm"] = shm
+        shared[key] = np.ndarray(shape, dtype, buffer=shm.buf)
+    shared["stop"] = stop
+    shared["kwargs"] = dict(kwargs or {}, **{key: shared[key] for key in array_specs})
+
+
+# one worker: reruns differently seeded planners until one finds a path, it
+# made `attempts` runs (None for no limit), the deadline passes or another
+# worker tells it to stop
+def search(planner_class, start, goal, seed, stride, end, mode, attempts):
+    maze = shared["maze"]
+    collision = CollisionChecker(shared["occupancy"])
+    stop = shared["stop"]
+
+    attempt = 0
+    while not stop.is_set() and (attempts is None or attempt < attempts):
+        budget = None if end is None else end - time.monotonic()
+        if budget is not None and budget <= 0:
+            break
+        np.random.seed(seed + attempt * stride)
+        planner = planner_class(
+            maze,
+            start,
+            goal,
+            collision=collision,
+            anytime=mode == "best",
+            time_budget=budget,
+            should_stop=stop.is_set,
+            **shared["kwargs"],
+        )
+        path = planner.run()
+        if path is not None:
+            return path, planner.best_cost()
+        attempt += 1
+    return None, np.inf
+
+
+# runs `workers` independent planners in a process pool. the map and its
+# obstacle bitmap are put in shared memory once and every worker plans on
+# views of them, as well as of array arguments like goal_visible. mode
+# "first" returns the first path any worker finds and stops the rest, mode
+# "best" lets every worker refine (anytime) until the deadline and returns
+# the cheapest path. `planner` is the planner class, RRTStar or anything
+# with the same contract, `collision` an optional prebuilt checker whose
+# bitmap is shared. each worker retries with new seeds up to `attempts`
+# times, by default until the deadline or, without a deadline, only once so
+# an unsolvable map can't keep it busy forever. returns (path, cost), path
+# is None if nothing was found in time. an exception in a worker stops the
+# others and is raised here
+def plan_parallel(
+    maze,
+    start,
+    goal,
+    workers=None,
+    deadline=None,
+    mode="first",
+    seed=0,
+    robot_radius=1,
+    planner=RRTStar,
+    collision=None,
+    attempts=None,
+    **kwargs,
+):
+    if mode not in ("first", "best"):
+        raise ValueError(f"unknown mode {mode!r}, expected 'first' or 'best'")
+    workers = workers or os.cpu_count()
+    if attempts is None and deadline is None:
+        attempts = 1
+    # the monotonic clock is shared by all processes and never jumps
+    end = None if deadline is None else time.monotonic() + deadline
+
+    if collision is None:
+        collision = CollisionChecker.from_maze(maze, robot_radius)
+    occupancy = np.ascontiguousarray(collision.occupancy)
+    maze_shm, maze_spec = share(np.ascontiguousarray(maze))
+    occupancy_shm, occupancy_spec = share(occupancy)
+    kwargs, array_shms, array_specs = share_arrays(kwargs)
+    ctx = mp.get_context()
+    stop = ctx.Event()
+
+    best_path, best_cost = None, np.inf
+    try:
+        with ProcessPoolExecutor(
+            workers,
+            mp_context=ctx,
+            initializer=attach,
+            initargs=(maze_spec, occupancy_spec, stop, kwargs, array_specs),
+        ) as pool:
+            pending = {
+                pool.submit(
+                    search, planner, start, goal, seed + k, workers, end, mode, attempts
+                )
+                for k in range(workers)
+            }
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        path, cost = future.result()
+                        if cost < best_cost:
+                            best_path, best_cost = path, cost
+                    if mode == "first" and best_path is not None:
+                        stop.set()
+            finally:
+                # also when a worker raised, the pool only shuts down once
+                # every worker has returned
+                stop.set()
+    finally:
+        for shm in (maze_shm, occupancy_shm, *array_shms):
+            shm.close()
+            shm.unlink()
+
+    return best_path, best_cost
+
+
+# one query of plan_many in a worker, planned on the shared map
+def solve(planner_class, start, goal, seed, attempts):
+    t = time.perf_counter()
+    collision = CollisionChecker(shared["occupancy"])
+    for attempt in range(attempts):
+        np.random.seed(seed + attempt)
+        planner = planner_class(
+            shared["maze"], start, goal, collision=collision, **shared["kwargs"]
+        )
+        path = planner.run()
+        if path is not None:
+            return np.asarray(path), planner.best_cost(), time.perf_counter() - t
+    return None, np.inf, time.perf_counter() - t
+
+
+# plans every (start, goal) pair of `queries` on one map. the map and its
+# obstacle bitmap are preprocessed once and shared with a pool of workers
+# like in plan_parallel, the queries are spread over the workers and kwargs
+# (e.g. a roadmap) are sent to each worker once, arrays through shared
+# memory. a sampling planner gets `attempts` tries, query k is seeded with
+# seed + k * attempts and its retries with the seeds after that, so the
+# results don't depend on the scheduling and no two tries share a seed.
+# returns (paths, costs, times): a list of (n, 2) arrays (None where nothing
+# was found), the path costs (inf for failures) and the planning time of
+# each query in seconds
+def plan_many(
+    maze,
+    queries,
+    workers=None,
+    seed=0,
+    attempts=1,
+    robot_radius=1,
+    planner=RRTStar,
+    collision=None,
+    **kwargs,
+):
+    workers = workers or os.cpu_count()
+    if collision is None:
+        collision = CollisionChecker.from_maze(maze, robot_radius)
+    maze_shm, maze_spec = share(np.ascontiguousarray(maze))
+    occupancy_shm, occupancy_spec = share(np.ascontiguousarray(collision.occupancy))
+    kwargs, array_shms, array_specs = share_arrays(kwargs)
+
+    try:
+        with ProcessPoolExecutor(
+            workers,
+            initializer=attach,
+            initargs=(maze_spec, occupancy_spec, None, kwargs, array_specs),
+        ) as pool:
+            futures = [
+                pool.submit(
+                    solve,
+                    planner,
+                    tuple(start),
+                    tuple(goal),
+                    seed + k * attempts,
+                    attempts,
+                )
+                for k, (start, goal) in enumerate(queries)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        for shm in (maze_shm, occupancy_shm, *array_shms):
+            shm.close()
+            shm.unlink()
+
+    paths = [path for path, _, _ in results]
+    costs = np.array([cost for _, cost, _ in results], dtype=float)
+    times = np.array([t for _, _, t in results], dtype=float)
+    return paths, costs, times
@@ -0,0 +1,125 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import numpy as np
+
+from kinematics import map_axis_scale, map_origin, time_parameterize
+from map_cache import file_hash, save_array
+
+# bump whenever the arrays or meta.json of a path change meaning, loading a
+# path written by another version fails instead of guessing
+PATH_VERSION = 1
+
+
+# automap pixels to game coordinates and back, with the fit in kinematics.py
+def map_to_game(q):
+    return (np.asarray(q, dtype=float) - map_origin) / map_axis_scale
+
+
+def game_to_map(q):
+    return np.asarray(q, dtype=float) * map_axis_scale + map_origin
+
+
+# a planned path stored like a map cache bundle: a directory of .npy files
+# plus meta.json, so it loads without pickle and every array is
+# memory-mapped read-only. per vertex: pixels, game, cost (cumulative, in
+# the planner's cost), clearance, headings (radians, image frame) and
+# arc_length; segment_tics has one entry per segment. meta.json holds the
+# version, the sha256 of the map image, the planner settings, the seed and
+# timing
+class PathArtifact:
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.map_key = meta["map"]
+        self.arrays = {}
+
+    def array(self, name):
+        if name not in self.arrays:
+            filename = os.path.join(self.directory, name + ".npy")
+            self.arrays[name] = np.load(filename, mmap_mode="r")
+        return self.arrays[name]
+
+    @property
+    def pixels(self):
+        return self.array("pixels")
+
+    @property
+    def game(self):
+        return self.array("game")
+
+    # raises ValueError unless the path was planned on the image map_file
+    def check_map(self, map_file):
+        key = file_hash(map_file)
+        if key != self.map_key:
+            raise ValueError(
+                f"{self.directory} was planned on map {self.map_key[:12]}, "
+                f"{map_file} is {key[:12]}"
+            )
+
+
+# per-vertex arrays of a final path for save_path. the cost is the arc
+# length, or the expected tics under `model` with `tics`
+def path_arrays(path, arc_length, headings, field, model, tics=False):
+    pts = np.asarray(path, dtype=float)
+    segment_tics = time_parameterize(pts, model)
+    cost = np.r_[0, np.cumsum(segment_tics)] if tics else arc_length
+    return {
+        "cost": cost,
+        "clearance": field.at(np.rint(pts).astype(np.int64)),
+        "headings": headings,
+        "arc_length": arc_length,
+        "segment_tics": segment_tics,
+    }
+
+
+# writes the path to `directory`, replacing an earlier one only once the new
+# one is complete. arrays are extra per-vertex (or per-segment) arrays, see
+# path_arrays
+def save_path(
+    directory, pixels, map_key, settings=None, seed=None, timing=None, **arrays
+):
+    pixels = np.asarray(pixels, dtype=float)
+    arrays = dict(arrays, pixels=pixels, game=map_to_game(pixels))
+    meta = {
+        "version": PATH_VERSION,
+        "map": map_key,
+        "vertices": len(pixels),
+        "arrays": sorted(arrays),
+        "settings": settings or {},
+        "seed": seed,
+        "timing": timing or {},
+        "created": time.time(),
+    }
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    tmp = tempfile.mkdtemp(dir=parent)
+    for name, arr in arrays.items():
+        save_array(tmp, name, np.asarray(arr))
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    if os.path.exists(directory):
+        old = tempfile.mkdtemp(dir=parent)
+        os.replace(directory, os.path.join(old, "path"))
+        os.replace(tmp, directory)
+        shutil.rmtree(old)
+    else:
+        os.replace(tmp, directory)
+    return PathArtifact(directory, meta)
+
+
+# the path in `directory`, checked against the map image map_file if given
+def load_path(directory, map_file=None):
+    with open(os.path.join(directory, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("version") != PATH_VERSION:
+        raise ValueError(
+            f"{directory} has path format {meta.get('version')}, "
+            f"expected {PATH_VERSION}"
+        )
+    artifact = PathArtifact(directory, meta)
+    if map_file is not None:
+        artifact.check_map(map_file)
+    return artifact
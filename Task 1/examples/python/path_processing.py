@@ -0,0 +1,229 @@
+import numpy as np
+import cv2 as cv
+
+from collision import rasterize, wall_mask
+
+
+# euclidean distance from every pixel to the closest wall pixel and the unit
+# gradient of that distance, i.e. the direction that moves away from walls
+class ClearanceField:
+    def __init__(self, dist, grad=None):
+        self.dist = dist
+        if grad is None:
+            gy, gx = np.gradient(dist)
+            norm = np.hypot(gx, gy)
+            norm[norm == 0] = 1
+            grad = np.stack([gx / norm, gy / norm], axis=-1)
+        self.grad = grad
+        self.height, self.width = dist.shape
+
+    @classmethod
+    def from_maze(cls, maze):
+        free = (~wall_mask(maze)).astype(np.uint8)
+        return cls(cv.distanceTransform(free, cv.DIST_L2, 5))
+
+    def pixels(self, pts):
+        x = np.clip(pts[:, 0], 0, self.width - 1)
+        y = np.clip(pts[:, 1], 0, self.height - 1)
+        return y, x
+
+    def at(self, pts):
+        return self.dist[self.pixels(pts)]
+
+    def gradient_at(self, pts):
+        return self.grad[self.pixels(pts)]
+
+    # smallest clearance along each segment p0[k] -> p1[k]
+    def segments_min(self, p0, p1):
+        xs, ys = rasterize(p0, p1)
+        pts = np.stack([xs.ravel(), ys.ravel()], axis=1)
+        return self.at(pts).reshape(xs.shape).min(axis=1)
+
+
+# greedy shortcutting: from each kept vertex jump to the furthest later
+# vertex it can see, all candidates checked in one batch. a shortcut must also
+# keep at least the clearance of the stretch of path it replaces, up to
+# `clearance`, so it never trades safety for length
+def shortcut(path, checker, field, clearance):
+    pts = np.asarray(path)
+    edge_min = np.minimum(field.segments_min(pts[:-1], pts[1:]), clearance)
+    keep = [0]
+    i = 0
+    while i < len(pts) - 1:
+        need = np.minimum.accumulate(edge_min[i:])
+        ok = checker.segments_free(pts[i + 1 :], pts[i])
+        ok &= field.segments_min(pts[i + 1 :], pts[i]) >= need
+        ok[0] = True
+        i = i + 1 + np.flatnonzero(ok)[-1]
+        keep.append(i)
+    return pts[keep]
+
+
+# points along the path every `spacing` pixels of arc length, end points kept
+def resample(path, spacing):
+    pts = np.asarray(path, dtype=float)
+    s = np.concatenate([[0], np.cumsum(np.hypot(*np.diff(pts, axis=0).T))])
+    n = max(int(np.ceil(s[-1] / spacing)), 1)
+    t = np.linspace(0, s[-1], n + 1)
+    x = np.interp(t, s, pts[:, 0])
+    y = np.interp(t, s, pts[:, 1])
+    return np.rint(np.stack([x, y], axis=1)).astype(np.int64)
+
+
+# moves every inner vertex closer than `clearance` to a wall up the
+# distance gradient, at most max_step pixels per pass. even and odd vertices
+# move in turns so each move is checked against its fixed neighbours and a
+# move is only taken if both adjacent segments stay collision free
+def push_clearance(pts, field, checker, clearance, passes=5, max_step=2.0):
+    pts = pts.copy()
+    for _ in range(passes):
+        moved = False
+        for first in (1, 2):
+            ids = np.arange(first, len(pts) - 1, 2)
+            if len(ids) == 0:
+                continue
+            d = field.at(pts[ids])
+            step = np.minimum(clearance - d, max_step)
+            need = step > 0
+            if not need.any():
+                continue
+            ids, step = ids[need], step[need]
+            cand = np.rint(pts[ids] + field.gradient_at(pts[ids]) * step[:, None])
+            cand = cand.astype(np.int64)
+            ok = checker.segments_free(pts[ids - 1], cand)
+            ok &= checker.segments_free(cand, pts[ids + 1])
+            ok &= field.at(cand) > d[need]
+            pts[ids[ok]] = cand[ok]
+            moved |= ok.any()
+        if not moved:
+            break
+    return pts
+
+
+# drops inner vertices whose two edges can be replaced by one straight edge
+# that is collision free and no closer to a wall than the two it replaces
+# (again capped at `clearance`). every other vertex is tried per pass so the
+# neighbours of a removed vertex stay fixed
+def simplify(pts, checker, field, clearance, passes=3):
+    pts = np.asarray(pts)
+    for _ in range(passes):
+        for first in (1, 2):
+            if len(pts) < 3:
+                return pts
+            edge_min = np.minimum(field.segments_min(pts[:-1], pts[1:]), clearance)
+            ids = np.arange(first, len(pts) - 1, 2)
+            a, b = pts[ids - 1], pts[ids + 1]
+            need = np.minimum(edge_min[ids - 1], edge_min[ids])
+            drop = checker.segments_free(a, b) & (field.segments_min(a, b) >= need)
+            pts = np.delete(pts, ids[drop], axis=0)
+    return pts
+
+
+# post-processing of a planner path: shortcut it, resample every `spacing`
+# pixels, push vertices closer than `clearance` to a wall away from it and
+# drop the vertices that aren't needed any more. no step lowers the
+# clearance of the path below `clearance` and all segments of the result
+# stay collision free under `checker`
+def optimize_path(path, field, checker, clearance=6, spacing=10, passes=10):
+    pts = shortcut(path, checker, field, clearance)
+    dense = resample(pts, spacing)
+    # rounding the resampled points can clip a wall corner, keep the sparse
+    # path then
+    if checker.segments_free(dense[:-1], dense[1:]).all():
+        pts = dense
+    pts = push_clearance(pts, field, checker, clearance, passes)
+    return simplify(pts, checker, field, clearance)
+
+
+# C1 cubic hermite curve through the vertices, chord length parameterized:
+# the tangent at a vertex points from its previous to its next neighbour.
+# evaluated every `step` pixels of chord length, returns the curve points,
+# the straight polyline at the same parameters and the segment of each point
+def hermite_curve(pts, step=1.0):
+    d = np.hypot(*np.diff(pts, axis=0).T)
+    m = np.empty_like(pts)
+    m[1:-1] = (pts[2:] - pts[:-2]) / (d[:-1] + d[1:])[:, None]
+    m[0] = (pts[1] - pts[0]) / d[0]
+    m[-1] = (pts[-1] - pts[-2]) / d[-1]
+
+    k = np.maximum(np.ceil(d / step).astype(np.int64), 1)
+    seg = np.repeat(np.arange(len(d)), k)
+    u = (np.arange(len(seg)) - np.repeat(np.cumsum(k) - k, k)) / k[seg]
+    u, h = u[:, None], d[seg][:, None]
+    p0, p1 = pts[seg], pts[seg + 1]
+    curve = (
+        (2 * u**3 - 3 * u**2 + 1) * p0
+        + (u**3 - 2 * u**2 + u) * h * m[seg]
+        + (3 * u**2 - 2 * u**3) * p1
+        + (u**3 - u**2) * h * m[seg + 1]
+    )
+    line = p0 + u * (p1 - p0)
+    seg = np.append(seg, len(d) - 1)
+    return np.vstack([curve, pts[-1:]]), np.vstack([line, pts[-1:]]), seg
+
+
+# resamples the path at a fixed arc length spacing along a smooth curve: a
+# hermite spline through its vertices, kept straight on every segment where
+# the spline would hit a wall or come closer to one than the segment itself
+# (up to `clearance`). the points are `spacing` pixels of arc length apart,
+# or slightly less so that the goal and the corners of straightened
+# segments are sampled exactly. if some chord still breaks these bounds
+# after `rounds` rounds of straightening, the whole path is kept straight
+# and sampled on its own segments, which are known to be free. returns the
+# points as floats, their arc length from the start and the heading in
+# radians of the segment leaving each point (the last one repeats the
+# previous)
+def spline_resample(path, field, checker, clearance=6, spacing=10, rounds=5):
+    pts = np.asarray(path, dtype=float)
+    pts = pts[np.r_[True, np.any(np.diff(pts, axis=0) != 0, axis=1)]]
+    if len(pts) < 2:
+        return pts, np.zeros(len(pts)), np.zeros(len(pts))
+    ends = np.rint(pts).astype(np.int64)
+    need = np.minimum(field.segments_min(ends[:-1], ends[1:]), clearance)
+    curve, line, seg = hermite_curve(pts)
+    # index of every vertex in the dense curve
+    vertex = np.r_[np.flatnonzero(np.diff(seg)) + 1, len(seg) - 1]
+    vertex = np.r_[0, vertex]
+    straight = np.zeros(len(pts) - 1, dtype=bool)
+
+    for i in range(rounds + 1):
+        if i == rounds:
+            straight[:] = True
+        dense = np.where(straight[seg][:, None], line, curve)
+        s = np.concatenate([[0], np.cumsum(np.hypot(*np.diff(dense, axis=0).T))])
+        # evenly spaced samples between knots: the ends and the vertices of
+        # straight segments
+        knots = np.zeros(len(pts), dtype=bool)
+        knots[[0, -1]] = True
+        knots[:-1] |= straight
+        knots[1:] |= straight
+        k = s[vertex[knots]]
+        n = np.maximum(np.ceil(np.diff(k) / spacing).astype(np.int64), 1)
+        piece = np.repeat(np.arange(len(n)), n)
+        offset = np.arange(len(piece)) - np.repeat(np.cumsum(n) - n, n)
+        arc = np.r_[k[piece] + offset * (np.diff(k) / n)[piece], k[-1]]
+        out = np.stack(
+            [np.interp(arc, s, dense[:, 0]), np.interp(arc, s, dense[:, 1])], axis=1
+        )
+        if straight.all():
+            break
+
+        # a chord of the samples must keep what every segment it crosses
+        # keeps, otherwise those segments are straightened and resampled. a
+        # chord on a straight segment lies inside it (its vertices are
+        # knots), only the rounding to pixels could tell them apart
+        q = np.rint(out).astype(np.int64)
+        idx = np.minimum(np.searchsorted(s, arc, side="right") - 1, len(s) - 2)
+        lowest = np.minimum.reduceat(need[seg], idx[:-1])
+        lowest = np.minimum(lowest, need[seg[idx[1:]]])
+        mid = np.searchsorted(s, (arc[:-1] + arc[1:]) / 2, side="right") - 1
+        bad = ~checker.segments_free(q[:-1], q[1:])
+        bad |= field.segments_min(q[:-1], q[1:]) < lowest
+        bad &= ~straight[seg[mid]]
+        if not bad.any():
+            break
+        for a, b in zip(seg[idx[:-1][bad]], seg[idx[1:][bad]]):
+            straight[a : b + 1] = True
+
+    heading = np.arctan2(*np.diff(out, axis=0).T[::-1])
+    return out, arc, np.append(heading, heading[-1:])
@@ -0,0 +1,286 @@
+from argparse import ArgumentParser
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+from path_artifact import game_to_map
+from planning import WarmMap, plan_path, planner_names
+
+# a unix socket next to the maps, a named pipe on windows
+if sys.platform == "win32":
+    default_address = r"\\.\pipe\vizdoom_planner"
+else:
+    default_address = "planner.sock"
+# random authentication key of a running server, readable by its owner only
+default_key_file = "planner.key"
+
+
+def write_key(filename):
+    key = os.urandom(32)
+    if os.path.exists(filename):
+        os.remove(filename)
+    fd = os.open(filename, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    return key
+
+
+def read_key(filename):
+    with open(filename, "rb") as f:
+        return f.read()
+
+
+# raises ValueError unless the pixel q lies on the map
+def check_pixel(occupancy, q, what):
+    h, w = occupancy.shape
+    if not (0 <= q[0] < w and 0 <= q[1] < h):
+        raise ValueError(f"{what} {tuple(q)} is outside the {w}x{h} map")
+
+
+# closest free pixel to q within `radius` pixels, q itself if it is free. the
+# player can stand closer to a wall than the robot radius the map is
+# inflated by
+def nearest_free(occupancy, q, radius=10):
+    check_pixel(occupancy, q, "pixel")
+    x, y = q
+    if not occupancy[y, x]:
+        return q
+    x0, y0 = max(x - radius, 0), max(y - radius, 0)
+    ys, xs = np.nonzero(~occupancy[y0 : y + radius + 1, x0 : x + radius + 1])
+    if len(xs) == 0:
+        return q
+    i = np.argmin((xs + x0 - x) ** 2 + (ys + y0 - y) ** 2)
+    return (int(xs[i] + x0), int(ys[i] + y0))
+
+
+# long-running planning service: keeps every map it has seen warm (cached
+# artifacts, collision checker, clearance field, roadmap) and answers
+# requests from game processes over a multiprocessing connection. requests
+# and replies are dicts, pickled by the connection, so a client has to
+# prove it knows the authkey before anything is unpickled. without an
+# explicit authkey the server draws a random one and writes it to key_file
+# (only readable by its owner), and the unix socket is created with owner
+# only permissions. a request has an "op":
+#   load     {"map"}: warms the map, returns its start, goal and hash
+#   plan     {"map", "start", "goal", "planner", "options"}: start and goal
+#            in map pixels, default the map's. returns plan_path's result
+#   replan   {"map", "position", "goal", "planner", "options"}: plans from
+#            a position in game coordinates to the goal of the last plan on
+#            the map (or `goal`), e.g. after the player got pushed off it
+#   shutdown stops the server
+# every reply has "ok" and, if that is False, "error"
+class PlanServer:
+    def __init__(
+        self,
+        address=default_address,
+        cache_dir=None,
+        authkey=None,
+        planner="prm",
+        options=None,
+        key_file=default_key_file,
+    ):
+        self.address = address
+        self.cache_dir = cache_dir
+        if authkey is None:
+            authkey = write_key(key_file)
+        self.authkey = authkey
+        self.planner = planner
+        self.options = options or {}
+        self.maps = {}
+        self.goals = {}
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.listener = None
+
+    def warm(self, map_file):
+        map_file = os.path.abspath(map_file)
+        with self.lock:
+            if map_file not in self.maps:
+                self.maps[map_file] = WarmMap(map_file, self.cache_dir)
+            return self.maps[map_file]
+
+    def handle(self, request):
+        op = request.get("op")
+        if op == "shutdown":
+            self.done.set()
+            return {"ok": True}
+        t = time.perf_counter()
+        warm = self.warm(request["map"])
+        if op == "load":
+            return {
+                "ok": True,
+                "key": warm.key,
+                "start": warm.start,
+                "goal": warm.goal,
+                "seconds": time.perf_counter() - t,
+            }
+        if op not in ("plan", "replan"):
+            raise ValueError(f"unknown op {op!r}")
+
+        goal = request.get("goal")
+        if op == "plan":
+            start = request.get("start")
+        else:
+            x, y = np.rint(game_to_map(request["position"])).astype(np.int64)
+            pixel = (int(x), int(y))
+            position = tuple(request["position"])
+            check_pixel(warm.collision.occupancy, pixel, f"position {position} at")
+            start = nearest_free(warm.collision.occupancy, pixel)
+            goal = goal or self.goals.get(warm.map_file)
+        goal = warm.goal if goal is None else (int(goal[0]), int(goal[1]))
+        occupancy = warm.collision.occupancy
+        if start is not None:
+            check_pixel(occupancy, start, "start")
+        check_pixel(occupancy, goal, "goal")
+        self.goals[warm.map_file] = goal
+
+        options = dict(self.options, **request.get("options", {}))
+        planner = request.get("planner", self.planner)
+        result = plan_path(warm, start, goal, planner=planner, **options)
+        if result is None:
+            return {"ok": False, "error": "no path found"}
+        result.update(ok=True, key=warm.key, seconds=time.perf_counter() - t)
+        return result
+
+    def serve_client(self, conn):
+        with conn:
+            while not self.done.is_set():
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    reply = self.handle(request)
+                except Exception as e:
+                    reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                conn.send(reply)
+                if self.done.is_set():
+                    # wake up the accept loop so it sees the flag
+                    self.wake()
+
+    def wake(self):
+        try:
+            Client(self.address, authkey=self.authkey).close()
+        except OSError:
+            pass
+
+    def serve_forever(self):
+        if sys.platform == "win32":
+            self.listener = Listener(self.address, authkey=self.authkey)
+        else:
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            # the socket is created owner only, never open to others
+            umask = os.umask(0o177)
+            try:
+                self.listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(umask)
+        try:
+            while not self.done.is_set():
+                try:
+                    conn = self.listener.accept()
+                except (OSError, AuthenticationError):
+                    continue
+                threading.Thread(
+                    target=self.serve_client, args=(conn,), daemon=True
+                ).start()
+        finally:
+            self.listener.close()
+
+
+# game-side end of a PlanServer connection, errors of the server are raised
+# as RuntimeError. the authkey is read from key_file unless given
+class PlanClient:
+    def __init__(self, address=default_address, authkey=None, key_file=None):
+        if authkey is None:
+            authkey = read_key(key_file or default_key_file)
+        self.conn = Client(address, authkey=authkey)
+
+    def request(self, op, **kwargs):
+        self.conn.send(dict(kwargs, op=op))
+        reply = self.conn.recv()
+        if not reply["ok"]:
+            raise RuntimeError(reply["error"])
+        return reply
+
+    def load(self, map_file):
+        return self.request("load", map=os.path.abspath(map_file))
+
+    def plan(self, map_file, start=None, goal=None, planner=None, **options):
+        kwargs = {} if planner is None else {"planner": planner}
+        return self.request(
+            "plan",
+            map=os.path.abspath(map_file),
+            start=start,
+            goal=goal,
+            options=options,
+            **kwargs,
+        )
+
+    def replan(self, map_file, position, goal=None, planner=None, **options):
+        kwargs = {} if planner is None else {"planner": planner}
+        return self.request(
+            "replan",
+            map=os.path.abspath(map_file),
+            position=tuple(position),
+            goal=goal,
+            options=options,
+            **kwargs,
+        )
+
+    def shutdown(self):
+        self.request("shutdown")
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Serve plan and replan requests with warm maps.")
+    parser.add_argument("--address", default=default_address)
+    parser.add_argument(
+        "--preload", nargs="*", default=["map.png"], help="maps to warm up front"
+    )
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument(
+        "--key-file",
+        default=default_key_file,
+        help="file the random authkey is written to, clients read it from there",
+    )
+    parser.add_argument(
+        "--planner",
+        choices=planner_names,
+        default="prm",
+        help="planner of requests that don't name one, the roadmap answers "
+        "in milliseconds once it is built",
+    )
+    parser.add_argument("--clearance", type=float, default=6)
+    parser.add_argument("--spacing", type=float, default=10)
+    args = parser.parse_args()
+
+    server = PlanServer(
+        args.address,
+        args.cache_dir,
+        planner=args.planner,
+        options=dict(clearance=args.clearance, spacing=args.spacing),
+        key_file=args.key_file,
+    )
+    for map_file in args.preload:
+        t = time.perf_counter()
+        warm = server.warm(map_file)
+        if args.planner == "prm":
+            warm.load_roadmap()
+        print(f"{map_file}: warm in {time.perf_counter() - t:.2f}s")
+    print("listening on", args.address)
+    server.serve_forever()
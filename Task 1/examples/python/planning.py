@@ -0,0 +1,142 @@
+import threading
+import time
+
+from kinematics import KinematicModel
+from map_cache import load_artifacts
+from path_artifact import map_to_game, path_arrays
+from path_processing import optimize_path, spline_resample
+from rrtstar import RRTStar
+
+planner_names = ("rrtstar", "birrtstar", "astar", "thetastar", "prm")
+
+
+# a preprocessed map held in memory for repeated queries: the cached
+# artifacts with their collision checker and clearance field. the roadmap
+# and the goal visibility mask are loaded by the first query that needs them
+class WarmMap:
+    def __init__(self, map_file, cache_dir=None, robot_radius=1):
+        self.map_file = map_file
+        self.artifacts = load_artifacts(map_file, cache_dir, radii=(robot_radius,))
+        self.key = self.artifacts.key
+        self.maze = self.artifacts.maze
+        self.start = self.artifacts.start
+        self.goal = self.artifacts.goal
+        self.robot_radius = robot_radius
+        self.collision = self.artifacts.collision(robot_radius)
+        self.field = self.artifacts.clearance()
+        self.roadmap = None
+        self.lock = threading.Lock()
+
+    def load_roadmap(self):
+        from prm import load_roadmap
+
+        with self.lock:
+            if self.roadmap is None:
+                self.roadmap = load_roadmap(self.artifacts, self.robot_radius)
+        return self.roadmap
+
+    # planner `name` from start to goal on this map, kwargs go to the rrt
+    # planners. rrtstar gets the goal mask when the goal is the map's own,
+    # the "free" sampler the cached free pixels
+    def planner(self, name, start, goal, **kwargs):
+        if name in ("rrtstar", "birrtstar") and kwargs.get("sampler") == "free":
+            with self.lock:
+                free_ids = self.artifacts.free_ids(self.robot_radius)
+            kwargs.setdefault("free_ids", free_ids)
+        if name in ("astar", "thetastar"):
+            from grid_planner import GridPlanner
+
+            return GridPlanner(
+                self.maze,
+                start,
+                goal,
+                any_angle=name == "thetastar",
+                collision=self.collision,
+            )
+        if name == "prm":
+            from prm import PRMPlanner
+
+            return PRMPlanner(
+                self.maze,
+                start,
+                goal,
+                roadmap=self.load_roadmap(),
+                collision=self.collision,
+            )
+        if name == "birrtstar":
+            from birrtstar import BiRRTStar
+
+            return BiRRTStar(self.maze, start, goal, collision=self.collision, **kwargs)
+        if name == "rrtstar":
+            if goal == self.goal:
+                with self.lock:
+                    visible = self.artifacts.visibility(goal, self.robot_radius)
+                kwargs.setdefault("goal_visible", visible)
+            return RRTStar(self.maze, start, goal, collision=self.collision, **kwargs)
+        raise ValueError(f"unknown planner {name!r}, expected one of {planner_names}")
+
+
+# the post-processing of rrtstar.py: shortcut and push the path away from
+# walls, resample it every `spacing` pixels along a spline and compute the
+# per-vertex arrays of path_artifact.path_arrays. returns (points, arrays)
+def post_process(
+    path, field, collision, model=None, clearance=6, spacing=10, tics=False
+):
+    if model is None:
+        model = KinematicModel()
+    smooth = optimize_path(path, field, collision, clearance=clearance)
+    smooth, arc_length, headings = spline_resample(
+        smooth, field, collision, clearance, spacing
+    )
+    return smooth, path_arrays(smooth, arc_length, headings, field, model, tics)
+
+
+# plans on a warm map from start to goal (default the map's) and
+# post-processes the path. sampling planners get `attempts` tries, kwargs go
+# to them (max_iter, sampler, lazy, time_budget, ...). with `kinematic`
+# rrtstar minimizes the expected tics under `model`. returns None if no path
+# was found, otherwise a dict with the points in pixels and game coordinates
+# (`pixels`, `game`), the arrays of path_arrays, the planner's `best_cost`
+# and the plan and post-processing times (`timing`)
+def plan_path(
+    warm,
+    start=None,
+    goal=None,
+    planner="rrtstar",
+    attempts=1,
+    clearance=6,
+    spacing=10,
+    model=None,
+    kinematic=False,
+    **kwargs,
+):
+    start = warm.start if start is None else (int(start[0]), int(start[1]))
+    goal = warm.goal if goal is None else (int(goal[0]), int(goal[1]))
+    if model is None:
+        model = KinematicModel()
+    if kinematic:
+        if planner != "rrtstar":
+            raise ValueError("kinematic costs only work with the rrtstar planner")
+        kwargs["cost_model"] = model
+
+    t = time.perf_counter()
+    path = None
+    for _ in range(attempts):
+        instance = warm.planner(planner, start, goal, **kwargs)
+        path = instance.run()
+        if path is not None:
+            break
+    t_post = time.perf_counter()
+    if path is None:
+        return None
+
+    pixels, arrays = post_process(
+        path, warm.field, warm.collision, model, clearance, spacing, kinematic
+    )
+    return dict(
+        arrays,
+        pixels=pixels,
+        game=map_to_game(pixels),
+        best_cost=float(instance.best_cost()),
+        timing={"plan": t_post - t, "post_process": time.perf_counter() - t_post},
+    )
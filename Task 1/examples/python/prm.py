@@ -0,0 +1,275 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappop, heappush
+import math
+import os
+import time
+import numpy as np
+
+from collision import CollisionChecker
+from grid_planner import euclidean
+from parallel_planner import share, shared
+
+# parts of a roadmap on disk, indptr is written last and marks it complete
+roadmap_parts = ("nodes", "indices", "weights", "indptr")
+
+
+def attach_occupancy(occupancy_spec):
+    name, shape, dtype = occupancy_spec
+    from multiprocessing.shared_memory import SharedMemory
+
+    shm = SharedMemory(name=name)
+    shared["occupancy_shm"] = shm
+    shared["occupancy"] = np.ndarray(shape, dtype, buffer=shm.buf)
+
+
+def check_edges(p0, p1):
+    return CollisionChecker(shared["occupancy"]).segments_free(p0, p1)
+
+
+# all pairs of `nodes` closer than `radius`. the nodes are sorted by x and
+# every node is compared with the one k places further on, for growing k
+# until all of those are more than `radius` apart in x
+def candidate_edges(nodes, radius):
+    order = np.argsort(nodes[:, 0], kind="stable")
+    pts = nodes[order].astype(float)
+    src, dst = [], []
+    for k in range(1, len(pts)):
+        d = pts[k:] - pts[:-k]
+        if d[:, 0].min() > radius:
+            break
+        close = np.flatnonzero(np.hypot(d[:, 0], d[:, 1]) <= radius)
+        src.append(order[close])
+        dst.append(order[close + k])
+    if not src:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(src), np.concatenate(dst)
+
+
+# probabilistic roadmap over the free space of an obstacle bitmap, stored as
+# a symmetric graph in CSR form: the neighbours of node i are
+# indices[indptr[i]:indptr[i + 1]] with edge lengths weights[...]. it is
+# built once per map and then answers any number of start/goal queries
+class Roadmap:
+    def __init__(self, nodes, indptr, indices, weights):
+        self.nodes = nodes
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @classmethod
+    def build(
+        cls, occupancy, n_samples=8000, radius=30, seed=0, workers=None, chunk=20000
+    ):
+        rng = np.random.default_rng(seed)
+        h, w = occupancy.shape
+        free = np.flatnonzero(~np.asarray(occupancy).ravel())
+        ids = rng.choice(free, size=min(n_samples, len(free)), replace=False)
+        nodes = np.stack([ids % w, ids // w], axis=1).astype(np.int64)
+
+        src, dst = candidate_edges(nodes, radius)
+        chunks = [
+            (nodes[src[k : k + chunk]], nodes[dst[k : k + chunk]])
+            for k in range(0, len(src), chunk)
+        ]
+        if workers == 1:
+            collision = CollisionChecker(occupancy)
+            ok = [collision.segments_free(p0, p1) for p0, p1 in chunks]
+        else:
+            # the candidate edges are checked in chunks across a process pool
+            # that shares one copy of the bitmap
+            shm, spec = share(np.ascontiguousarray(occupancy))
+            try:
+                with ProcessPoolExecutor(
+                    workers or os.cpu_count(),
+                    initializer=attach_occupancy,
+                    initargs=(spec,),
+                ) as pool:
+                    ok = list(pool.map(check_edges, *zip(*chunks))) if chunks else []
+            finally:
+                shm.close()
+                shm.unlink()
+        ok = np.concatenate(ok) if ok else np.zeros(0, dtype=bool)
+        src, dst = src[ok], dst[ok]
+
+        # both directions, sorted by source node
+        a = np.concatenate([src, dst])
+        b = np.concatenate([dst, src])
+        order = np.argsort(a, kind="stable")
+        a, b = a[order], b[order]
+        weights = np.hypot(*(nodes[a] - nodes[b]).T)
+        indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(a, minlength=len(nodes)), out=indptr[1:])
+        return cls(nodes, indptr, b.astype(np.int32), weights)
+
+    def save(self, directory, name):
+        from map_cache import save_array
+
+        for part in roadmap_parts:
+            save_array(directory, f"{name}_{part}", getattr(self, part))
+
+    @classmethod
+    def load(cls, directory, name):
+        parts = {
+            part: np.load(os.path.join(directory, f"{name}_{part}.npy"), mmap_mode="r")
+            for part in roadmap_parts
+        }
+        return cls(**parts)
+
+    def neighbours(self, i):
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return zip(self.indices[lo:hi].tolist(), self.weights[lo:hi].tolist())
+
+    # roadmap nodes within `radius` of q that q can see, with their distances
+    def links(self, q, checker, radius):
+        d = np.hypot(*(self.nodes - np.asarray(q)).T)
+        ids = np.flatnonzero(d <= radius)
+        ok = checker.segments_free(self.nodes[ids], q)
+        return ids[ok].tolist(), d[ids[ok]].tolist()
+
+    # A* from start to goal through the roadmap. start and goal are linked
+    # to the visible nodes around them (the search radius is doubled until
+    # there is at least one) and are the only collision checks of a query.
+    # returns (path, cost), path None if they aren't connected
+    def query(self, start, goal, checker, radius=30):
+        start = (int(start[0]), int(start[1]))
+        goal = (int(goal[0]), int(goal[1]))
+        if checker.segment_free(start, goal):
+            return [start, goal], euclidean(goal[0] - start[0], goal[1] - start[1])
+
+        s_id, g_id = len(self.nodes), len(self.nodes) + 1
+        ends = []
+        for q in (start, goal):
+            r = radius
+            ids, d = self.links(q, checker, r)
+            while not ids and r < max(checker.width, checker.height):
+                r *= 2
+                ids, d = self.links(q, checker, r)
+            ends.append(dict(zip(ids, d)))
+        start_links, goal_links = ends
+
+        nodes = self.nodes.tolist()
+        gx, gy = goal
+
+        def heuristic(i):
+            if i == g_id:
+                return 0.0
+            x, y = start if i == s_id else nodes[i]
+            return euclidean(gx - x, gy - y)
+
+        g = {s_id: 0.0}
+        parent = {s_id: s_id}
+        closed = set()
+        open_list = [(heuristic(s_id), s_id)]
+        while open_list:
+            _, u = heappop(open_list)
+            if u in closed:
+                continue
+            closed.add(u)
+            if u == g_id:
+                break
+            if u == s_id:
+                edges = start_links.items()
+            else:
+                edges = self.neighbours(u)
+                if u in goal_links:
+                    edges = [*edges, (g_id, goal_links[u])]
+            for n, c in edges:
+                c += g[u]
+                if c < g.get(n, math.inf):
+                    g[n] = c
+                    parent[n] = u
+                    heappush(open_list, (c + heuristic(n), n))
+
+        if g_id not in closed:
+            return None, np.inf
+        ids = [g_id]
+        while ids[-1] != s_id:
+            ids.append(parent[ids[-1]])
+        path = [start]
+        path += [tuple(nodes[i]) for i in reversed(ids[1:-1])]
+        path.append(goal)
+        return path, g[g_id]
+
+
+# the roadmap of a cached map (map_cache.MapArtifacts), built and added to
+# its bundle on the first call, memory-mapped from it after
+def load_roadmap(
+    artifacts, robot_radius=1, n_samples=8000, radius=30, seed=0, workers=None
+):
+    name = f"prm_r{robot_radius}_n{n_samples}_d{radius}_s{seed}"
+    if not os.path.exists(os.path.join(artifacts.directory, name + "_indptr.npy")):
+        roadmap = Roadmap.build(
+            artifacts.occupancy(robot_radius), n_samples, radius, seed, workers
+        )
+        roadmap.save(artifacts.directory, name)
+    return Roadmap.load(artifacts.directory, name)
+
+
+# same constructor and run() contract as the other planners, on top of a
+# prebuilt roadmap (built from the map if none is given)
+class PRMPlanner:
+    def __init__(
+        self,
+        maze,
+        start,
+        goal,
+        roadmap=None,
+        radius=30,
+        robot_radius=1,
+        collision=None,
+        workers=None,
+    ):
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        if roadmap is None:
+            roadmap = Roadmap.build(collision.occupancy, radius=radius, workers=workers)
+        self.collision = collision
+        self.roadmap = roadmap
+        self.start = start
+        self.goal = goal
+        self.radius = radius
+        self.cost = np.inf
+        # why the last run() found no path, None if it found one
+        self.status = None
+
+    def run(self):
+        path, self.cost = self.roadmap.query(
+            self.start, self.goal, self.collision, self.radius
+        )
+        self.status = None if path is not None else "no path through the roadmap"
+        return path
+
+    def best_cost(self):
+        return self.cost
+
+
+if __name__ == "__main__":
+    from map_cache import load_artifacts
+
+    parser = ArgumentParser("Build the roadmap of a map and time a query on it.")
+    parser.add_argument("--map", default="map.png")
+    parser.add_argument("--samples", type=int, default=8000)
+    parser.add_argument("--radius", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    artifacts = load_artifacts(args.map)
+    t = time.perf_counter()
+    roadmap = load_roadmap(
+        artifacts,
+        n_samples=args.samples,
+        radius=args.radius,
+        seed=args.seed,
+        workers=args.workers,
+    )
+    print(
+        f"roadmap: {len(roadmap.nodes)} nodes, {len(roadmap.indices) // 2} edges,"
+        f" {time.perf_counter() - t:.3f}s"
+    )
+    t = time.perf_counter()
+    path, cost = roadmap.query(
+        artifacts.start, artifacts.goal, artifacts.collision(), args.radius
+    )
+    print(f"query: cost {cost:.1f}, {1000 * (time.perf_counter() - t):.1f}ms")
@@ -0,0 +1,112 @@
+from collections import defaultdict
+import json
+from time import perf_counter
+import numpy as np
+
+# planner method -> phase it is timed as. times are inclusive, e.g. the
+# collision checks done inside "parent" also count towards "collision".
+# "extend" counts every tree step, birrtstar takes several per iteration
+# while connecting, the iterations of run() are counted as "iteration"
+phases = {
+    "run": "run",
+    "extend": "extend",
+    "sample": "sampling",
+    "find_nearest": "nearest",
+    "find_near_nodes": "near",
+    "choose_parent": "parent",
+    "rewire_near": "rewire",
+    "sees_goal": "goal",
+    "prune": "prune",
+    "validate": "validate",
+}
+
+
+# counters and timers of planner runs. attach(planner) replaces the planner's
+# methods listed in `phases` and its collision checks on that instance with
+# timed wrappers, so a planner without stats runs the plain methods and pays
+# nothing. every `every` iterations the tree size is recorded
+class PlannerStats:
+    def __init__(self, every=100):
+        self.every = every
+        self.counts = defaultdict(int)
+        self.times = defaultdict(float)
+        # collision checks: segments and pixels checked
+        self.segments = 0
+        self.pixels = 0
+        # (iteration, seconds since attach, nodes in the tree)
+        self.tree_size = []
+        self.t0 = perf_counter()
+
+    def attach(self, planner):
+        for method, phase in phases.items():
+            if hasattr(planner, method):
+                setattr(planner, method, self.timed(getattr(planner, method), phase))
+        if hasattr(planner, "run"):
+            planner.sample = self.iteration(planner, planner.sample)
+        for method in ("is_valid_move", "segments_free"):
+            if hasattr(planner, method):
+                setattr(planner, method, self.collision(getattr(planner, method)))
+        self.t0 = perf_counter()
+        return planner
+
+    def timed(self, fn, phase):
+        counts, times = self.counts, self.times
+
+        def wrapper(*args, **kwargs):
+            t = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                times[phase] += perf_counter() - t
+                counts[phase] += 1
+
+        return wrapper
+
+    # run() samples exactly once per iteration
+    def iteration(self, planner, sample):
+        def wrapper(*args):
+            n = self.counts["iteration"]
+            if n % self.every == 0:
+                self.tree_size.append((n, perf_counter() - self.t0, planner.n_nodes))
+            self.counts["iteration"] += 1
+            return sample(*args)
+
+        return wrapper
+
+    def collision(self, fn):
+        timed = self.timed(fn, "collision")
+
+        def wrapper(p0, p1):
+            d = np.abs(np.asarray(p1) - np.asarray(p0)).reshape(-1, 2)
+            self.segments += len(d)
+            self.pixels += int(d.max(axis=1, initial=0).sum()) + len(d)
+            return timed(p0, p1)
+
+        return wrapper
+
+    def to_dict(self):
+        return {
+            "phases": {
+                phase: {"count": self.counts[phase], "seconds": self.times[phase]}
+                for phase in sorted(self.counts)
+            },
+            "collision_segments": self.segments,
+            "collision_pixels": self.pixels,
+            "tree_size": [list(row) for row in self.tree_size],
+        }
+
+    def dump(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        total = self.times["run"] or 1
+        lines = [f"{'phase':<10} {'count':>8} {'seconds':>9} {'share':>6}"]
+        for phase in sorted(self.times, key=self.times.get, reverse=True):
+            t = self.times[phase]
+            lines.append(
+                f"{phase:<10} {self.counts[phase]:>8} {t:>9.3f} {t / total:>6.1%}"
+            )
+        lines.append(f"iterations: {self.counts['iteration']}")
+        lines.append(f"collision: {self.segments} segments, {self.pixels} pixels")
+        return "\n".join(lines)
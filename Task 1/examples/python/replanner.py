@@ -0,0 +1,152 @@
+from heapq import heappop, heappush
+import math
+import numpy as np
+
+from collision import CollisionChecker, obstacle_map
+from grid_planner import merge_straight, moves, octile
+
+# km and the heuristic add up in a different order after moves, keys that
+# are equal can differ in the last bits
+key_eps = 1e-9
+
+
+# incremental replanning with D* Lite on the 8-connected grid of the obstacle
+# bitmap. the search runs backwards from the goal, so when the map changes
+# (the automap reveals walls, doors open or close) or the player moves, only
+# the cells whose distance-to-goal actually changes are touched again instead
+# of replanning from scratch. cells not seen yet count as free.
+# same constructor and run() contract as GridPlanner
+class DStarLite:
+    def __init__(self, maze, start, goal, robot_radius=1, collision=None):
+        self.robot_radius = robot_radius
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        h, w = collision.occupancy.shape
+        self.height, self.width = h, w
+        # bytearray for fast scalar access, numpy view of it for diffs
+        self.blocked = bytearray(np.ascontiguousarray(collision.occupancy).tobytes())
+        self.grid = np.frombuffer(self.blocked, dtype=np.uint8).reshape(h, w)
+
+        self.start = self.cell(start)
+        self.goal = self.cell(goal)
+        self.last = self.start
+        self.km = 0.0
+        self.g = [math.inf] * (h * w)
+        self.rhs = [math.inf] * (h * w)
+        self.rhs[self.goal] = 0.0
+        self.queue = [(self.key(self.goal), self.goal)]
+        # why the last run() found no path, None if it found one
+        self.status = None
+
+    def cell(self, q):
+        return int(q[1]) * self.width + int(q[0])
+
+    def point(self, s):
+        return s % self.width, s // self.width
+
+    def heuristic(self, a, b):
+        return octile(
+            a % self.width - b % self.width, a // self.width - b // self.width
+        )
+
+    def key(self, s):
+        m = min(self.g[s], self.rhs[s])
+        return (m + self.heuristic(self.start, s) + self.km, m)
+
+    # neighbours of s with the cost of the move, inf if it is blocked
+    def edges(self, s):
+        w, h, blocked = self.width, self.height, self.blocked
+        y, x = divmod(s, w)
+        for dx, dy, step in moves:
+            nx, ny = x + dx, y + dy
+            if not (0 <= nx < w and 0 <= ny < h):
+                continue
+            n = ny * w + nx
+            if blocked[s] or blocked[n]:
+                yield n, math.inf
+            elif dx and dy and (blocked[y * w + nx] or blocked[ny * w + x]):
+                yield n, math.inf
+            else:
+                yield n, step
+
+    def update_vertex(self, s):
+        if s != self.goal:
+            self.rhs[s] = min(
+                (c + self.g[n] for n, c in self.edges(s)), default=math.inf
+            )
+        if self.g[s] != self.rhs[s]:
+            heappush(self.queue, (self.key(s), s))
+
+    # the queue keeps stale entries, they are skipped or re-keyed when popped.
+    # cells whose key ties with the start's are settled too, a tie left in
+    # the queue can be a cell whose g is still too low
+    def compute_shortest_path(self):
+        g, rhs, queue, start = self.g, self.rhs, self.queue, self.start
+        while queue and (
+            queue[0][0][0] <= self.key(start)[0] + key_eps or rhs[start] != g[start]
+        ):
+            k_old, s = heappop(queue)
+            if g[s] == rhs[s]:
+                continue
+            k_new = self.key(s)
+            if k_old[0] < k_new[0] - key_eps:
+                heappush(queue, (k_new, s))
+            elif g[s] > rhs[s]:
+                g[s] = rhs[s]
+                for n, _ in self.edges(s):
+                    self.update_vertex(n)
+            else:
+                g[s] = math.inf
+                self.update_vertex(s)
+                for n, _ in self.edges(s):
+                    self.update_vertex(n)
+
+    def run(self):
+        self.compute_shortest_path()
+        self.status = None
+        if self.g[self.start] == math.inf:
+            self.status = "no path"
+            return None
+
+        # follow the cheapest neighbour down to the goal, g has to drop with
+        # every step or the search left the grid inconsistent
+        path = [self.start]
+        s = self.start
+        while s != self.goal:
+            n = min(self.edges(s), key=lambda e: e[1] + self.g[e[0]])[0]
+            if not self.g[n] < self.g[s]:
+                self.status = f"no descent from {self.point(s)}"
+                return None
+            s = n
+            path.append(s)
+        return merge_straight([self.point(s) for s in path])
+
+    def best_cost(self):
+        return self.g[self.start]
+
+    # the player moved to q, keys already in the queue stay valid via km
+    def move_start(self, q):
+        self.start = self.cell(q)
+        self.km += self.heuristic(self.last, self.start)
+        self.last = self.start
+
+    # new obstacle bitmap, e.g. after the automap revealed more of the map.
+    # only the 3x3 blocks around changed cells have edges with new costs
+    def update_occupancy(self, occupancy):
+        changed = np.flatnonzero(self.grid.ravel() != occupancy.ravel())
+        if len(changed) == 0:
+            return 0
+        self.grid[:] = occupancy
+        ys, xs = np.divmod(changed, self.width)
+        touched = set()
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                ny, nx = ys + dy, xs + dx
+                ok = (ny >= 0) & (ny < self.height) & (nx >= 0) & (nx < self.width)
+                touched.update((ny[ok] * self.width + nx[ok]).tolist())
+        for s in touched:
+            self.update_vertex(s)
+        return len(changed)
+
+    def update_maze(self, maze):
+        return self.update_occupancy(obstacle_map(maze, self.robot_radius))
@@ -1,12 +1,21 @@
+from argparse import ArgumentParser
+import time
 import numpy as np
 import cv2 as cv
-import networkx as nx
 
-brown_colour = [11, 27, 47]  # in bgr
+from collision import CollisionChecker
+from kinematics import KinematicModel
+from path_processing import ClearanceField
+from sampling import make_sampler
+from spatial_index import make_index
+from visualization import TreeRenderer
 
 
 # finding a path using rrt* first
 class RRTStar:
+    # re-prune the tree once the best cost drops by this fraction
+    prune_threshold = 0.01
+
     def __init__(
         self,
         maze,
@@ -16,75 +25,387 @@ class RRTStar:
         max_dist=10,
         goal_sample_rate=0.2,
         search_radius=30,
+        index="grid",
+        sampler="uniform",
+        robot_radius=1,
+        collision=None,
+        anytime=False,
+        time_budget=None,
+        visualizer=None,
+        should_stop=None,
+        goal_visible=None,
+        lazy=False,
+        stats=None,
+        cost_model=None,
+        free_ids=None,
     ):
         self.maze = maze
         self.start = start
         self.goal = goal
-        self.graph = nx.Graph()
-        self.graph.add_node(start)
         self.goal_sample_rate = goal_sample_rate
         self.max_iter = max_iter
         self.max_dist = max_dist
         self.search_radius = search_radius
+        # in anytime mode the planner keeps refining the first solution until
+        # max_iter iterations or time_budget seconds are used up
+        self.anytime = anytime
+        self.time_budget = time_budget
+        # optional callable, planning ends as soon as it returns True
+        self.should_stop = should_stop
+        # optional callback(planner, node_id) for every node added, e.g. a
+        # visualization.TreeRenderer. planning is headless without it
+        self.visualizer = visualizer
+        # obstacle bitmap is built once per map and can be shared between planners
+        if collision is None:
+            collision = CollisionChecker.from_maze(maze, robot_radius)
+        self.collision = collision
+        # optional mask of the pixels that can see the goal
+        # (CollisionChecker.visible_from), makes the goal test a lookup
+        self.goal_visible = goal_visible
+        # free-space samples come in filtered blocks from sampling.py. the
+        # generator is seeded from the legacy global state so np.random.seed
+        # still makes a run reproducible. free_ids are the precomputed free
+        # pixels for the "free" sampler
+        rng = np.random.default_rng(np.random.randint(1 << 31))
+        self.sampler = make_sampler(sampler, collision.occupancy, rng, free_ids)
+        # lazy mode adds the edges to the near set (parent choice and
+        # rewiring) without checking them and only checks the ones that end
+        # up on a candidate solution, see validate()
+        self.lazy = lazy
+        # edges found blocked in lazy mode, as pairs of end points
+        self.blocked_edges = set()
+        # number of segments collision checked so far
+        self.n_checks = 0
+        # iterations of run() so far
+        self.n_iter = 0
+        # why the last run() found no path, None if it found one
+        self.status = None
+        # optional kinematics.KinematicModel, costs are then expected tics
+        # with the turn at every vertex instead of pixel length
+        self.cost_model = cost_model
+
+        # the tree is kept in flat arrays indexed by node id:
+        # nodes[i] is (x, y), parent[i] its parent id (-1 for the root)
+        # and costs[i] the path length from start, so cost lookups are O(1)
+        capacity = max_iter + 2
+        self.nodes = np.zeros((capacity, 2), dtype=np.int64)
+        self.parent = np.full(capacity, -1, dtype=np.int64)
+        self.costs = np.zeros(capacity)
+        # checked[i] is False while the edge parent[i] -> i is unchecked
+        self.checked = np.ones(capacity, dtype=bool)
+        self.n_nodes = 0
+        # child lists, only walked to push cost changes down a subtree
+        self.children = []
+        # spatial index over the same node ids for nearest/near queries
+        self.index_kind = index
+        self.index = make_index(index, maze.shape[:2], search_radius)
+        self.add_node(start, -1)
+
+        # node the best solution found so far reaches the goal from
+        self.goal_parent = -1
+        self.pruned_cost = np.inf
+
+        # optional profiling.PlannerStats, times the phases of this planner
+        if stats is not None:
+            stats.attach(self)
 
     def run(self):
-        # for _ in range(self.max_iter):
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+
         for _ in range(self.max_iter):
-            if np.random.uniform() < self.goal_sample_rate:
-                q_rand = self.goal
-            else:
-                q_rand = self.sample_random()
-
-            q_near = self.find_nearest(self.graph.nodes, q_rand)
-            q_new = self.steer(q_near, q_rand)
-
-            # print("q_rand: ", q_rand)
-            # print("q_near: ", q_near)
-            # print("q_new: ", q_new)
-
-            if self.is_valid_move(q_near, q_new):
-                # find the least cost node to connect to q_new
-                near_nodes = self.find_near_nodes(q_new)
-                q_min = q_near
-                c_min = self.cost(q_near) + self.dist(q_near, q_new)
-                for node in near_nodes:
-                    if self.is_valid_move(node, q_new):
-                        c = self.cost(node) + self.dist(node, q_new)
-                        if c < c_min:
-                            c_min = c
-                            q_min = node
-
-                # print("added")
-                self.graph.add_node(q_new)
-                self.graph.add_edge(q_min, q_new)
-
-                # check if we can reach the goal
-                if self.is_valid_move(q_new, self.goal):
-                    self.graph.add_node(self.goal)
-                    self.graph.add_edge(q_new, self.goal)
-                    return nx.shortest_path(
-                        self.graph, source=self.start, target=self.goal
-                    )
-
-                # check if q_new helps other nodes reduce their cost
-                for node in near_nodes:
-                    if node != q_min and self.is_valid_move(q_new, node):
-                        c = self.cost(q_new) + self.dist(q_new, node)
-                        if c < self.cost(node):
-                            # parent = self.find_nearest(self.graph.neighbors(node), node)
-                            # self.graph.remove_edge(node, parent)
-                            self.graph.add_edge(q_new, node)
-
-                self.visualize_path(
-                    nx.shortest_path(self.graph, source=self.start, target=q_new)
-                )
-
-        print(self.graph)
+            self.n_iter += 1
+            if self.time_budget is not None and time.perf_counter() > deadline:
+                break
+            if self.should_stop is not None and self.should_stop():
+                break
+
+            q_rand = self.sample()
+            i_new = self.extend(q_rand)
+            if i_new < 0:
+                continue
+
+            # check if we can reach the goal
+            q_new = self.node(i_new)
+            if self.sees_goal(q_new):
+                c_goal = self.cost(i_new) + self.edge_costs([i_new], self.goal)[0]
+                if c_goal < self.best_cost():
+                    self.goal_parent = i_new
+                    if self.lazy:
+                        self.validate()
+                if not self.anytime and self.goal_parent >= 0:
+                    break
+
+            if self.goal_parent >= 0:
+                c_best = self.best_cost()
+                if c_best < self.pruned_cost * (1 - self.prune_threshold):
+                    # rewiring may have put unchecked edges on the path
+                    if not self.lazy or self.validate():
+                        self.prune(self.best_cost())
+
+        if self.lazy:
+            self.validate()
+        if self.goal_parent >= 0:
+            i_goal = self.add_node(self.goal, self.goal_parent)
+            return self.path_to(i_goal)
+
+        self.status = f"tree with {self.n_nodes} nodes, no path"
         return None
 
+    # one rrt* step towards q_rand: steer, pick the cheapest collision free
+    # parent in the near set, insert and rewire the near set through the new
+    # node. returns the new node id, or -1 if the step was blocked
+    def extend(self, q_rand):
+        i_near = self.find_nearest(q_rand)
+        q_near = self.node(i_near)
+        q_new = self.steer(q_near, q_rand)
+        if not self.is_valid_move(q_near, q_new):
+            return -1
+
+        near_nodes = self.find_near_nodes(q_new)
+        near_dists = self.dists(near_nodes, q_new)
+        if np.any(near_dists == 0):
+            # q_new is already in the tree, adding it again would give a
+            # zero-length edge
+            return int(near_nodes[np.argmin(near_dists)])
+        if self.lazy:
+            # optimistic, only edges already found blocked are left out
+            near_free = self.known_free(near_nodes, q_new)
+        else:
+            # one batched check of all edges to the near set, reused for rewiring
+            near_free = self.segments_free(self.nodes[near_nodes], q_new)
+        i_min = self.choose_parent(i_near, q_new, near_nodes, near_dists, near_free)
+
+        i_new = self.add_node(q_new, i_min)
+        # only the edge from i_near has been checked
+        self.checked[i_new] = not self.lazy or i_min == i_near
+        self.rewire_near(i_new, i_min, near_nodes, near_dists, near_free)
+
+        if self.visualizer is not None:
+            self.visualizer(self, i_new)
+        return i_new
+
+    # cheapest parent for q_new among i_near and the free part of the near set
+    def choose_parent(self, i_near, q_new, near_nodes, near_dists, near_free):
+        c_min = self.cost(i_near) + self.edge_costs([i_near], q_new)[0]
+        c = self.costs[near_nodes] + self.edge_costs(near_nodes, q_new, near_dists)
+        near_costs = np.where(near_free, c, np.inf)
+        if len(near_nodes) and near_costs.min() < c_min:
+            return int(near_nodes[np.argmin(near_costs)])
+        return i_near
+
+    # moves the near nodes that get cheaper through i_new under it
+    def rewire_near(self, i_new, i_min, near_nodes, near_dists, near_free):
+        c = self.cost(i_new) + self.edge_costs_from(i_new, near_nodes, near_dists)
+        better = near_free & (c < self.costs[near_nodes])
+        better &= near_nodes != i_min
+        for i, c_i in zip(near_nodes[better], c[better]):
+            self.rewire(int(i), i_new, c_i)
+            self.checked[i] = not self.lazy
+
+    # cost of the best path to the goal found so far
+    def best_cost(self):
+        if self.goal_parent < 0:
+            return np.inf
+        i = self.goal_parent
+        return self.costs[i] + self.edge_costs([i], self.goal)[0]
+
+    # drops every node whose cost plus straight line distance to the goal
+    # already exceeds c_best, these can't be part of a better solution.
+    # descendants of a dropped node are always dropped with it
+    def prune(self, c_best):
+        n = self.n_nodes
+        h = self.dists(np.arange(n), self.goal)
+        if self.cost_model is not None:
+            h = self.cost_model.min_tics(h)
+        keep = self.costs[:n] + h <= c_best + 1e-6
+        keep[0] = True
+        self.compact(keep)
+        self.pruned_cost = c_best
+
+    # keeps only the nodes with keep[i] set, closed under parents, and
+    # renumbers them in order
+    def compact(self, keep):
+        new_id = np.cumsum(keep) - 1
+        kept = np.flatnonzero(keep)
+        parent = self.parent[kept]
+        self.nodes[: len(kept)] = self.nodes[kept]
+        self.costs[: len(kept)] = self.costs[kept]
+        self.checked[: len(kept)] = self.checked[kept]
+        self.parent[: len(kept)] = np.where(parent >= 0, new_id[parent], -1)
+        self.n_nodes = len(kept)
+        if self.goal_parent >= 0:
+            kept_goal = keep[self.goal_parent]
+            self.goal_parent = int(new_id[self.goal_parent]) if kept_goal else -1
+        self.children = [[] for _ in range(self.n_nodes)]
+        for i in range(1, self.n_nodes):
+            self.children[self.parent[i]].append(i)
+
+        self.index = make_index(
+            self.index_kind, self.maze.shape[:2], self.search_radius
+        )
+        for q in self.nodes[: self.n_nodes]:
+            self.index.add(q)
+
+    # lazy mode: checks the unchecked edges on the path to the goal in one
+    # batch. blocked edges are remembered and the subtree below the first
+    # one is repaired, until the path is fully checked (True) or there is no
+    # path left (False)
+    def validate(self):
+        while self.goal_parent >= 0:
+            ids = []
+            i = self.goal_parent
+            while i > 0:
+                ids.append(i)
+                i = self.parent[i]
+            ids = np.array(ids[::-1], dtype=np.int64)
+            todo = ids[~self.checked[ids]]
+            if len(todo) == 0:
+                return True
+            free = self.segments_free(self.nodes[self.parent[todo]], self.nodes[todo])
+            self.checked[todo[free]] = True
+            if free.all():
+                return True
+            self.repair(int(todo[~free][0]))
+        return False
+
+    # the edge into node i is blocked: i moves under the cheapest near node
+    # outside its own subtree whose edge isn't known to be blocked (again
+    # unchecked), or its whole subtree is dropped if there is none
+    def repair(self, i):
+        q = self.node(i)
+        self.blocked_edges.add(edge_key(self.node(self.parent[i]), q))
+        sub = self.subtree(i)
+        near = self.find_near_nodes(q)
+        near = near[~np.isin(near, sub)]
+        near = near[self.known_free(near, q)]
+        if len(near):
+            c = self.costs[near] + self.edge_costs(near, q)
+            j = int(np.argmin(c))
+            self.rewire(i, int(near[j]), c[j])
+            self.checked[i] = False
+        else:
+            keep = np.ones(self.n_nodes, dtype=bool)
+            keep[sub] = False
+            self.compact(keep)
+
+    # False for the edges ids[k] -> q already found blocked
+    def known_free(self, ids, q):
+        if not self.blocked_edges:
+            return np.ones(len(ids), dtype=bool)
+        q = (int(q[0]), int(q[1]))
+        return np.array(
+            [edge_key(self.node(i), q) not in self.blocked_edges for i in ids],
+            dtype=bool,
+        )
+
+    # moves node i under new_parent and lowers the cost of its whole subtree
+    # by the same amount in one update, so costs stay exact after rewiring.
+    # with a cost model the turns at the children of i change too, the
+    # subtree is then recomputed top down
+    def rewire(self, i, new_parent, c):
+        self.children[self.parent[i]].remove(i)
+        self.children[new_parent].append(i)
+        self.parent[i] = new_parent
+        if self.cost_model is None:
+            self.costs[self.subtree(i)] -= self.costs[i] - c
+            return
+        self.costs[i] = c
+        for j in self.subtree(i)[1:]:
+            p = self.parent[j]
+            self.costs[j] = self.costs[p] + self.edge_costs([p], self.nodes[j])[0]
+
+    def subtree(self, root):
+        ids = [root]
+        k = 0
+        while k < len(ids):
+            ids.extend(self.children[ids[k]])
+            k += 1
+        return ids
+
+    def add_node(self, q, parent):
+        if self.n_nodes == len(self.parent):
+            self.grow()
+        i = self.n_nodes
+        self.nodes[i] = q
+        self.parent[i] = parent
+        self.checked[i] = True
+        if parent >= 0:
+            self.costs[i] = self.costs[parent] + self.edge_costs([parent], q)[0]
+        self.n_nodes += 1
+        self.children.append([])
+        if parent >= 0:
+            self.children[parent].append(i)
+        self.index.add(q)
+        return i
+
+    def grow(self):
+        # only needed when more nodes than iterations get added, e.g. by
+        # the connect step of the bidirectional planner
+        n = len(self.parent)
+        self.nodes = np.concatenate([self.nodes, np.zeros_like(self.nodes)])
+        self.parent = np.concatenate([self.parent, np.full(n, -1, dtype=np.int64)])
+        self.costs = np.concatenate([self.costs, np.zeros(n)])
+        self.checked = np.concatenate([self.checked, np.ones(n, dtype=bool)])
+
+    def node(self, i):
+        return int(self.nodes[i, 0]), int(self.nodes[i, 1])
+
+    def path_to(self, i):
+        # walk the parent pointers back to the root
+        path = []
+        while i != -1:
+            path.append(self.node(i))
+            i = self.parent[i]
+        return path[::-1]
+
+    def to_networkx(self):
+        # optional export of the tree, networkx is only needed here
+        import networkx as nx
+
+        graph = nx.Graph()
+        graph.add_node(self.node(0))
+        for i in range(1, self.n_nodes):
+            p = self.parent[i]
+            graph.add_edge(
+                self.node(p), self.node(i), weight=self.costs[i] - self.costs[p]
+            )
+        return graph
+
+    def sample(self):
+        # once a solution exists only the informed set can improve it
+        if self.goal_parent >= 0:
+            c_best = self.best_cost()
+            if self.cost_model is not None:
+                c_best = self.cost_model.max_length(c_best)
+            return self.sample_informed(c_best)
+        if np.random.uniform() < self.goal_sample_rate:
+            return self.goal
+        return self.sample_random()
+
+    # uniform sample from the ellipse with foci start and goal whose points
+    # have start->point->goal distance below c_best
+    def sample_informed(self, c_best):
+        c_min = self.dist(self.start, self.goal)
+        cx = (self.start[0] + self.goal[0]) / 2
+        cy = (self.start[1] + self.goal[1]) / 2
+        a = c_best / 2
+        b = np.sqrt(max(c_best**2 - c_min**2, 0)) / 2
+        theta = np.arctan2(self.goal[1] - self.start[1], self.goal[0] - self.start[0])
+        h, w = self.maze.shape[:2]
+
+        for _ in range(10):
+            r = np.sqrt(np.random.uniform())
+            phi = np.random.uniform(0, 2 * np.pi)
+            ex, ey = a * r * np.cos(phi), b * r * np.sin(phi)
+            x = cx + ex * np.cos(theta) - ey * np.sin(theta)
+            y = cy + ex * np.sin(theta) + ey * np.cos(theta)
+            if 0 <= x < w and 0 <= y < h:
+                break
+        return min(max(x, 0), w - 1), min(max(y, 0), h - 1)
+
     def sample_random(self):
-        y, x = np.random.uniform(0, self.maze.shape[:2])
-        return (x, y)
+        return self.sampler()
 
     def steer(self, q_near, q_rand):
         if self.dist(q_near, q_rand) < self.max_dist:
@@ -97,132 +418,424 @@ class RRTStar:
         )
         return q_new
 
-    def find_nearest(self, list, q_rand):
-        nearest_dist = float("inf")
-        nearest_node = None
-        for node in list:
-            dist = self.dist(node, q_rand)
-            if dist < nearest_dist:
-                nearest_dist = dist
-                nearest_node = node
-        return nearest_node
+    def find_nearest(self, q_rand):
+        return self.index.nearest(q_rand)
 
     def dist(self, q1, q2):
         return np.sqrt((q1[0] - q2[0]) ** 2 + (q1[1] - q2[1]) ** 2)
 
-    def cost(self, node):
-        return nx.shortest_path_length(self.graph, source=self.start, target=node)
+    def cost(self, i):
+        return self.costs[i]
+
+    def dists(self, ids, q):
+        diff = self.nodes[ids] - np.asarray(q, dtype=float)
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+    # cost of the edges ids[k] -> q: their length, or with a cost model the
+    # tics to turn at ids[k] and walk to q
+    def edge_costs(self, ids, q, lengths=None):
+        if lengths is None:
+            lengths = self.dists(ids, q)
+        if self.cost_model is None:
+            return lengths
+        d = np.asarray(q, dtype=float) - self.nodes[ids]
+        out = np.arctan2(d[:, 1], d[:, 0])
+        return self.cost_model.tics(lengths, self.headings(ids), out)
+
+    # cost of the edges i -> ids[k]
+    def edge_costs_from(self, i, ids, lengths):
+        if self.cost_model is None:
+            return lengths
+        d = self.nodes[ids] - self.nodes[i]
+        out = np.arctan2(d[:, 1], d[:, 0])
+        return self.cost_model.tics(lengths, self.headings([i])[0], out)
+
+    # heading each node was reached with, the model's start heading (nan if
+    # unknown) for the root
+    def headings(self, ids):
+        ids = np.asarray(ids)
+        parent = self.parent[ids]
+        d = self.nodes[ids] - self.nodes[np.maximum(parent, 0)]
+        h = np.arctan2(d[:, 1], d[:, 0])
+        start = self.cost_model.start_heading
+        h[parent < 0] = np.nan if start is None else start
+        return h
 
     def is_valid_move(self, q_near, q_new):
-        x_near, y_near = int(q_near[0]), int(q_near[1])
-        x_new, y_new = int(q_new[0]), int(q_new[1])
-
-        dx = x_new - x_near
-        dy = y_new - y_near
-        steps = max(abs(dx), abs(dy))
-
-        if steps == 0:
-            return True
-
-        for i in range(1, steps + 1):
-            x = x_near + int(i * dx / steps)
-            y = y_near + int(i * dy / steps)
-
-            flag = 0
-            sub_array = maze_img[y - 1 : y + 2, x - 1 : x + 2]
-            for row in sub_array:
-                for ele in row:
-                    if list(ele) == brown_colour:
-                        flag = 1
-                        break
-                if flag:
-                    break
+        self.n_checks += 1
+        return self.collision.segment_free(q_near, q_new)
 
-            if flag:
-                return False
+    def segments_free(self, p0, p1):
+        self.n_checks += len(p0)
+        return self.collision.segments_free(p0, p1)
 
-        return True
+    def sees_goal(self, q):
+        if self.goal_visible is None:
+            return self.is_valid_move(q, self.goal)
+        return self.goal_visible[q[1], q[0]]
 
     def find_near_nodes(self, q_new):
-        near_nodes = []
-        for node in self.graph.nodes:
-            if self.dist(node, q_new) < self.search_radius:
-                near_nodes.append(node)
-        return near_nodes
-
-    def visualize_path(self, path):
-        maze_with_path = self.maze.copy()
-        for node in path:
-            x, y = int(node[0]), int(node[1])
-            cv.circle(maze_with_path, (x, y), 1, (0, 0, 255), -1)
-
-        cv.imshow("RRT* Path Visualization", maze_with_path)
-        cv.waitKey(1)
-
-
-def avoid_walls(maze_img, path_orig):
-    path = np.array(path_orig.copy())
-
-    n = len(path)
-    for q in range(1, n - 1):
-        node = path[q]
-        x, y = node[0], node[1]
-        i, j = 0, 0
-        flag = 0
-        sub_array = maze_img[y - 3 : y + 4, x - 3 : x + 4]
-        for i in range(7):
-            for j in range(7):
-                if list(sub_array[i][j]) == [11, 27, 47]:
-                    flag = 1
-                    break
-            if flag:
-                break
-
-        if flag:
-            i -= 3
-            j -= 3
-            if i < 0:
-                path[q][1] += 4 + i
-            else:
-                path[q][1] -= 4 - i
-            if j < 0:
-                path[q][0] += 4 + j
-            else:
-                path[q][0] -= 4 - j
-
-    return path
-
-
-maze_img = cv.imread("map.png")
+        return self.index.within(q_new, self.search_radius)
+
+
+# the same key for both directions of an edge
+def edge_key(p, q):
+    return (p, q) if p < q else (q, p)
+
+
+def draw_path(img, path, colour):
+    for i in range(len(path) - 1):
+        p, q = path[i], path[i + 1]
+        cv.line(img, (int(p[0]), int(p[1])), (int(q[0]), int(q[1])), colour)
+
+
+# reads an automap image, start is the white pixel and goal the blue one
+def load_map(filename):
+    maze_img = cv.imread(filename)
+    if maze_img is None:
+        raise FileNotFoundError(filename)
+
+    start_y, start_x = np.where((maze_img == [255, 255, 255]).all(axis=-1))
+    goal_y, goal_x = np.where((maze_img == [255, 0, 0]).all(axis=-1))
+
+    start = (start_x[0], start_y[0])
+    goal = (goal_x[0], goal_y[0])
+    return maze_img, start, goal
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser("Global planning on map.png with RRT*.")
+    parser.add_argument(
+        "--anytime",
+        action="store_true",
+        help="keep refining the path with informed sampling after the first solution",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=None,
+        help="planning time limit in seconds per attempt",
+    )
+    parser.add_argument("--map", default="map.png")
+    parser.add_argument(
+        "--out",
+        default="path",
+        help="directory the path artifact is written to",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="random seed of the planners, recorded in the path artifact",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="preprocess the map from scratch instead of using .map_cache",
+    )
+    parser.add_argument("--max-iter", type=int, default=10000)
+    parser.add_argument(
+        "--planner",
+        choices=["rrtstar", "birrtstar", "astar", "thetastar", "prm"],
+        default="rrtstar",
+        help="single tree RRT*, bidirectional RRT*-Connect, the "
+        "deterministic grid planners A* and Theta*, or a query on the "
+        "cached probabilistic roadmap of the map",
+    )
+    parser.add_argument(
+        "--lazy",
+        action="store_true",
+        help="rrtstar only: check near-set edges only once they are on a "
+        "candidate path, prints the number of collision checks",
+    )
+    parser.add_argument(
+        "--kinematic",
+        action="store_true",
+        help="rrtstar only: minimize the expected tics of turning in place "
+        "and walking instead of the path length",
+    )
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=KinematicModel().speed,
+        help="walking speed in map pixels per tic for the tics estimate",
+    )
+    parser.add_argument(
+        "--turn-rate",
+        type=float,
+        default=KinematicModel().turn_rate,
+        help="turn rate in degrees per tic for the tics estimate",
+    )
+    parser.add_argument(
+        "--stats",
+        metavar="FILE",
+        default=None,
+        help="rrtstar/birrtstar without --workers: print per-phase counts "
+        "and times of each run and write them to FILE as json",
+    )
+    parser.add_argument(
+        "--sampler",
+        choices=["uniform", "free", "gaussian", "bridge"],
+        default="uniform",
+        help="free-space sampler of the rrt planners, gaussian and bridge "
+        "favour samples in narrow passages",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        default=1,
+        help="plan coarse-to-fine on an occupancy pyramid with this many "
+        "levels, each finer level only inside a corridor around the coarser path",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="run this many differently seeded planners in parallel, "
+        "--time-budget then is the overall deadline",
+    )
+    parser.add_argument(
+        "--clearance",
+        type=float,
+        default=6,
+        help="distance in pixels the final path tries to keep from walls",
+    )
+    parser.add_argument(
+        "--spacing",
+        type=float,
+        default=10,
+        help="arc length in pixels between the points of the final path",
+    )
+    parser.add_argument(
+        "--show-tree",
+        action="store_true",
+        help="draw the tree while planning (throttled to --render-interval)",
+    )
+    parser.add_argument("--render-interval", type=float, default=0.1)
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="don't open any windows, only write the output files",
+    )
+    args = parser.parse_args()
+    if args.lazy and args.planner != "rrtstar":
+        parser.error("--lazy only works with --planner rrtstar")
+    if args.kinematic and (args.planner != "rrtstar" or args.levels > 1):
+        parser.error("--kinematic only works with --planner rrtstar without --levels")
+    if args.stats and (
+        args.workers > 1 or args.planner not in ("rrtstar", "birrtstar")
+    ):
+        parser.error("--stats only works with rrtstar/birrtstar and one worker")
+    if args.levels > 1 and (
+        args.workers > 1 or args.planner == "prm" or args.stats or args.show_tree
+    ):
+        parser.error(
+            "--levels doesn't combine with --workers, --stats, --show-tree "
+            "or --planner prm"
+        )
 
-start_y, start_x = np.where((maze_img == [255, 255, 255]).all(axis=-1))
-goal_y, goal_x = np.where((maze_img == [255, 0, 0]).all(axis=-1))
+    if args.seed is None:
+        args.seed = int(np.random.randint(1 << 31))
+    np.random.seed(args.seed)
 
-start = (start_x[0], start_y[0])
-goal = (goal_x[0], goal_y[0])
+    t_start = time.perf_counter()
+    if args.no_cache:
+        maze_img, start, goal = load_map(args.map)
+        collision = CollisionChecker.from_maze(maze_img)
+        field = ClearanceField.from_maze(maze_img)
+    else:
+        from map_cache import load_artifacts
+
+        # read-only memory maps of the preprocessed map, built on the first run
+        artifacts = load_artifacts(args.map)
+        maze_img, start, goal = artifacts.maze, artifacts.start, artifacts.goal
+        collision = artifacts.collision()
+        field = artifacts.clearance()
+
+    t_plan = time.perf_counter()
+    model = KinematicModel(args.speed, args.turn_rate)
+    planner_class = RRTStar
+    planner_args = dict(max_iter=args.max_iter, sampler=args.sampler)
+    if args.planner == "birrtstar":
+        from birrtstar import BiRRTStar
+
+        planner_class = BiRRTStar
+    else:
+        planner_args["lazy"] = args.lazy
+        if args.kinematic:
+            planner_args["cost_model"] = model
+        if not args.no_cache:
+            # cached mask of the pixels that see the goal, one lookup per goal test
+            planner_args["goal_visible"] = artifacts.visibility()
+    if args.sampler == "free" and not args.no_cache:
+        planner_args["free_ids"] = artifacts.free_ids()
+
+    if args.levels > 1:
+        from hierarchical import HierarchicalPlanner
+
+        if args.planner in ("astar", "thetastar"):
+            from grid_planner import GridPlanner
+
+            level_planner = GridPlanner
+            level_args = dict(any_angle=args.planner == "thetastar")
+        else:
+            level_planner = planner_class
+            level_args = dict(
+                planner_args, anytime=args.anytime, time_budget=args.time_budget
+            )
+            # the visibility mask and free pixels only fit the full resolution map
+            level_args.pop("goal_visible", None)
+            level_args.pop("free_ids", None)
+        while True:
+            hierarchical = HierarchicalPlanner(
+                maze_img,
+                start,
+                goal,
+                levels=args.levels,
+                planner=level_planner,
+                collision=collision,
+                **level_args,
+            )
+            path = hierarchical.run()
+            for level, seconds, nodes, checks in hierarchical.level_stats:
+                line = f"level {level}: {seconds:.3f}s"
+                if nodes is not None:
+                    line += f", nodes {nodes}"
+                if checks is not None:
+                    line += f", checks {checks}"
+                print(line)
+            # the grid planners are deterministic, retrying them changes nothing
+            if path is not None or level_planner is not planner_class:
+                cost = hierarchical.best_cost()
+                break
+            print("trying again...")
+    elif args.planner in ("astar", "thetastar"):
+        from grid_planner import GridPlanner
+
+        # deterministic, no point in retrying or running it in parallel
+        grid_planner = GridPlanner(
+            maze_img,
+            start,
+            goal,
+            any_angle=args.planner == "thetastar",
+            collision=collision,
+        )
+        path = grid_planner.run()
+        cost = grid_planner.best_cost()
+        if path is None:
+            print(grid_planner.status)
+    elif args.planner == "prm":
+        from prm import PRMPlanner, Roadmap, load_roadmap
+
+        # the roadmap is built once per map and kept in the map cache
+        if args.no_cache:
+            roadmap = Roadmap.build(collision.occupancy, workers=args.workers)
+        else:
+            roadmap = load_roadmap(artifacts, workers=args.workers)
+        prm = PRMPlanner(maze_img, start, goal, roadmap=roadmap, collision=collision)
+        path = prm.run()
+        cost = prm.best_cost()
+        if path is None:
+            print(prm.status)
+    elif args.workers > 1:
+        from parallel_planner import plan_parallel
+
+        path, cost = plan_parallel(
+            maze_img,
+            start,
+            goal,
+            workers=args.workers,
+            deadline=args.time_budget,
+            mode="best" if args.anytime else "first",
+            seed=args.seed,
+            planner=planner_class,
+            collision=collision,
+            **planner_args,
+        )
+    else:
+        while True:
+            renderer = None
+            if args.show_tree and not args.headless:
+                renderer = TreeRenderer(maze_img, args.render_interval)
+            stats = None
+            if args.stats:
+                from profiling import PlannerStats
+
+                stats = PlannerStats()
+            rrt_star = planner_class(
+                maze_img,
+                start,
+                goal,
+                anytime=args.anytime,
+                time_budget=args.time_budget,
+                visualizer=renderer,
+                collision=collision,
+                stats=stats,
+                **planner_args,
+            )
+            path = rrt_star.run()
+            if stats is not None:
+                print(stats.summary())
+                stats.dump(args.stats)
+            if args.lazy:
+                print("collision checks:", rrt_star.n_checks)
+            if path is not None:
+                cost = rrt_star.best_cost()
+                break
+            print(rrt_star.status)
+            print("trying again...")
 
-while True:
-    rrt_star = RRTStar(maze_img, start, goal)
-    path = rrt_star.run()
+    t_post = time.perf_counter()
+    if path is None:
+        print("not found")
+    else:
+        print("Path found! cost:", cost)
+        from planning import post_process
+
+        # per-vertex cost, clearance, heading and arc length plus the
+        # expected tics of every segment, so the follower looks its progress
+        # up instead of recomputing it
+        smooth_path, arrays = post_process(
+            path,
+            field,
+            collision,
+            model,
+            args.clearance,
+            args.spacing,
+            tics=args.kinematic,
+        )
+        t_end = time.perf_counter()
 
-    if path is not None:
-        print("Path found!")
-        n = len(path)
-        for i in range(n - 1):
-            cv.line(maze_img, path[i], path[i + 1], (0, 0, 150))
-        cv.imshow("path", maze_img)
+        maze_img = np.array(maze_img)
+        draw_path(maze_img, path, (0, 0, 150))
+        if not args.headless:
+            cv.imshow("path", maze_img)
         cv.imwrite("orig_path.png", maze_img)
-        path = avoid_walls(maze_img, path)
-        n = len(path)
-        for i in range(n - 1):
-            cv.line(maze_img, path[i], path[i + 1], (0, 0, 255))
-        cv.imshow("path", maze_img)
+        path = smooth_path
+        draw_path(maze_img, path, (0, 0, 255))
         cv.imwrite("path.png", maze_img)
-        np.savez("path.npz", path_arr=path)
-        cv.waitKey(0)
-        cv.destroyAllWindows()
-        break
 
-    else:
-        print("not found")
-        print("trying again...")
+        from map_cache import file_hash
+        from path_artifact import save_path
+
+        print(f"expected tics: {arrays['segment_tics'].sum():.0f}")
+        timing = {
+            "load": t_plan - t_start,
+            "plan": t_post - t_plan,
+            "post_process": t_end - t_post,
+        }
+        if args.stats:
+            timing["phases"] = stats.to_dict()["phases"]
+        save_path(
+            args.out,
+            path,
+            artifacts.key if not args.no_cache else file_hash(args.map),
+            settings=vars(args),
+            seed=args.seed,
+            timing=timing,
+            **arrays,
+        )
+        if not args.headless:
+            cv.imshow("path", maze_img)
+            cv.waitKey(0)
+            cv.destroyAllWindows()
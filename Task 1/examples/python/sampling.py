@@ -0,0 +1,108 @@
+import numpy as np
+
+
+# hands out free-space samples one at a time from blocks of candidates drawn
+# and filtered against the obstacle bitmap in bulk. subclasses implement
+# draw(n), which returns an (m, 2) array of (x, y) samples that are all
+# free, m <= n since rejected candidates are dropped
+class UniformSampler:
+    def __init__(self, occupancy, rng=None, block=4096):
+        if np.all(occupancy):
+            raise ValueError("no free space to sample from")
+        self.occupancy = occupancy
+        self.height, self.width = occupancy.shape
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.block = block
+        self.buffer = np.zeros((0, 2))
+        self.pos = 0
+
+    def __call__(self):
+        while self.pos >= len(self.buffer):
+            self.buffer = self.draw(self.block).tolist()
+            self.pos = 0
+        q = self.buffer[self.pos]
+        self.pos += 1
+        return q[0], q[1]
+
+    def free(self, pts):
+        x = pts[:, 0].astype(np.int64)
+        y = pts[:, 1].astype(np.int64)
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        free = np.zeros(len(pts), dtype=bool)
+        free[inside] = ~self.occupancy[y[inside], x[inside]]
+        return free
+
+    def uniform(self, n):
+        return self.rng.uniform(0, 1, (n, 2)) * [self.width, self.height]
+
+    def draw(self, n):
+        pts = self.uniform(n)
+        return pts[self.free(pts)]
+
+
+# uniform over a precomputed list of free pixels, no candidate is rejected
+class FreePixelSampler(UniformSampler):
+    def __init__(self, occupancy, rng=None, block=4096, free_ids=None):
+        super().__init__(occupancy, rng, block)
+        if free_ids is None:
+            free_ids = np.flatnonzero(~np.asarray(occupancy).ravel())
+        self.free_ids = free_ids
+
+    def draw(self, n):
+        ids = self.free_ids[self.rng.integers(len(self.free_ids), size=n)]
+        return np.stack([ids % self.width, ids // self.width], axis=1)
+
+
+# narrow passage sampling. candidates come in pairs, the second one a
+# gaussian step of `sigma` pixels from the first. "gaussian" keeps the free
+# one of a pair with exactly one free point, i.e. samples close to walls,
+# "bridge" keeps the midpoint of pairs with both points inside walls if it
+# is free, i.e. samples between two walls like doors and corridors.
+# `uniform_rate` of the samples stay uniform so open space is still covered
+class NarrowPassageSampler(UniformSampler):
+    def __init__(
+        self, occupancy, rng=None, block=4096, mode="bridge", sigma=8, uniform_rate=0.5
+    ):
+        super().__init__(occupancy, rng, block)
+        if mode not in ("gaussian", "bridge"):
+            raise ValueError(f"unknown mode {mode!r}, expected 'gaussian' or 'bridge'")
+        self.mode = mode
+        self.sigma = sigma
+        self.uniform_rate = uniform_rate
+
+    def draw(self, n):
+        n_uniform = self.rng.binomial(n, self.uniform_rate)
+        uniform = super().draw(n_uniform)
+
+        a = self.uniform(n - n_uniform)
+        b = a + self.rng.normal(0, self.sigma, a.shape)
+        free_a, free_b = self.free(a), self.free(b)
+        if self.mode == "gaussian":
+            near = np.concatenate([a[free_a & ~free_b], b[free_b & ~free_a]])
+        else:
+            mid = (a + b) / 2
+            near = mid[~free_a & ~free_b]
+            near = near[self.free(near)]
+
+        pts = np.concatenate([uniform, near])
+        return pts[self.rng.permutation(len(pts))]
+
+
+samplers = {
+    "uniform": UniformSampler,
+    "free": FreePixelSampler,
+    "gaussian": lambda occupancy, rng=None: NarrowPassageSampler(
+        occupancy, rng, mode="gaussian"
+    ),
+    "bridge": NarrowPassageSampler,
+}
+
+
+# `free_ids`, the flat indices of the free pixels (e.g.
+# MapArtifacts.free_ids), spare FreePixelSampler another pass over the bitmap
+def make_sampler(kind, occupancy, rng=None, free_ids=None):
+    if isinstance(kind, str):
+        kind = samplers[kind]
+    if kind is FreePixelSampler:
+        return kind(occupancy, rng, free_ids=free_ids)
+    return kind(occupancy, rng)
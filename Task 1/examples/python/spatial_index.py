@@ -0,0 +1,161 @@
+import numpy as np
+
+
+# all indexes hand out ids in insertion order, so id i is node i of the tree
+class BruteForceIndex:
+    def __init__(self, shape=None, cell_size=None):
+        self.points = np.zeros((64, 2))
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    def add(self, q):
+        if self.n == len(self.points):
+            self.points = np.concatenate([self.points, np.zeros_like(self.points)])
+        i = self.n
+        self.points[i] = q
+        self.n += 1
+        return i
+
+    def nearest(self, q):
+        d = self.dists(np.arange(self.n), q)
+        return int(np.argmin(d))
+
+    def within(self, q, r):
+        d = self.dists(np.arange(self.n), q)
+        return np.flatnonzero(d < r)
+
+    def dists(self, ids, q):
+        diff = self.points[ids] - np.asarray(q, dtype=float)
+        return np.sqrt(np.einsum("ij,ij->i", diff, diff))
+
+
+# uniform grid of buckets, one cell per search radius so a radius query
+# only has to look at the 3x3 block of cells around the query point
+class GridIndex(BruteForceIndex):
+    brute_limit = 128
+
+    def __init__(self, shape, cell_size):
+        super().__init__()
+        self.cell = float(cell_size)
+        self.nx = int(np.ceil(shape[1] / self.cell)) + 1
+        self.ny = int(np.ceil(shape[0] / self.cell)) + 1
+        self.buckets = [[] for _ in range(self.nx * self.ny)]
+
+    def cell_of(self, q):
+        cx = min(max(int(q[0] // self.cell), 0), self.nx - 1)
+        cy = min(max(int(q[1] // self.cell), 0), self.ny - 1)
+        return cx, cy
+
+    def add(self, q):
+        i = super().add(q)
+        cx, cy = self.cell_of(q)
+        self.buckets[cy * self.nx + cx].append(i)
+        return i
+
+    def block(self, x0, x1, y0, y1):
+        x0, x1 = max(x0, 0), min(x1, self.nx - 1)
+        y0, y1 = max(y0, 0), min(y1, self.ny - 1)
+        ids = []
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                ids.extend(self.buckets[cy * self.nx + cx])
+        return ids
+
+    def ring(self, cx, cy, k):
+        if k == 0:
+            return self.buckets[cy * self.nx + cx]
+        ids = self.block(cx - k, cx + k, cy - k, cy - k)
+        ids += self.block(cx - k, cx + k, cy + k, cy + k)
+        ids += self.block(cx - k, cx - k, cy - k + 1, cy + k - 1)
+        ids += self.block(cx + k, cx + k, cy - k + 1, cy + k - 1)
+        return ids
+
+    def nearest(self, q):
+        if self.n <= self.brute_limit:
+            return super().nearest(q)
+        cx, cy = self.cell_of(q)
+        best, best_d = -1, np.inf
+        for k in range(max(self.nx, self.ny)):
+            ids = self.ring(cx, cy, k)
+            if ids:
+                d = self.dists(ids, q)
+                j = int(np.argmin(d))
+                if d[j] < best_d:
+                    best, best_d = ids[j], d[j]
+            # everything beyond ring k is at least k cells away
+            if best >= 0 and best_d <= k * self.cell:
+                break
+        return best
+
+    def within(self, q, r):
+        cx, cy = self.cell_of(q)
+        k = int(np.ceil(r / self.cell))
+        ids = np.array(self.block(cx - k, cx + k, cy - k, cy + k), dtype=np.int64)
+        if len(ids) == 0:
+            return ids
+        return np.sort(ids[self.dists(ids, q) < r])
+
+
+# kd-tree rebuilt with the logarithmic method: points go to a small buffer
+# that is scanned linearly, and full buffers are merged into a stack of
+# static trees whose sizes at least double from top to bottom
+class KDTreeIndex(BruteForceIndex):
+    buffer_size = 64
+
+    def __init__(self, shape=None, cell_size=None):
+        from scipy.spatial import cKDTree
+
+        super().__init__()
+        self.kdtree = cKDTree
+        self.levels = []
+        self.buffer_start = 0
+
+    def add(self, q):
+        i = super().add(q)
+        if self.n - self.buffer_start >= self.buffer_size:
+            self.flush()
+        return i
+
+    def flush(self):
+        ids = np.arange(self.buffer_start, self.n)
+        while self.levels and len(self.levels[-1][1]) <= len(ids):
+            ids = np.concatenate([self.levels.pop()[1], ids])
+        self.levels.append((self.kdtree(self.points[ids]), ids))
+        self.buffer_start = self.n
+
+    def nearest(self, q):
+        best, best_d = -1, np.inf
+        for tree, ids in self.levels:
+            d, j = tree.query(q)
+            if d < best_d:
+                best, best_d = ids[j], d
+        if self.buffer_start < self.n:
+            buf = np.arange(self.buffer_start, self.n)
+            d = self.dists(buf, q)
+            j = int(np.argmin(d))
+            if d[j] < best_d:
+                best = buf[j]
+        return int(best)
+
+    def within(self, q, r):
+        found = []
+        for tree, ids in self.levels:
+            found.append(ids[tree.query_ball_point(q, np.nextafter(r, 0))])
+        buf = np.arange(self.buffer_start, self.n)
+        found.append(buf[self.dists(buf, q) < r])
+        return np.sort(np.concatenate(found).astype(np.int64))
+
+
+indexes = {
+    "brute": BruteForceIndex,
+    "grid": GridIndex,
+    "kdtree": KDTreeIndex,
+}
+
+
+def make_index(kind, shape, cell_size):
+    if isinstance(kind, str):
+        kind = indexes[kind]
+    return kind(shape, cell_size)
@@ -0,0 +1,16 @@
+import numpy as np
+
+from birrtstar import BiRRTStar
+from maze_generator import generate_maze
+
+
+# steering onto a point already in a tree used to add it a second time,
+# seed 2 then joined the trees over a zero-length segment
+def test_anytime_path_has_no_repeated_vertices():
+    maze, start, goal = generate_maze(320, 240)
+    np.random.seed(2)
+    planner = BiRRTStar(maze, start, goal, anytime=True, max_iter=3000)
+    path = planner.run()
+    assert path is not None
+    steps = np.abs(np.diff(np.asarray(path), axis=0)).sum(axis=1)
+    assert np.all(steps > 0)
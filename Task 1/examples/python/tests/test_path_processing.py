@@ -0,0 +1,42 @@
+import numpy as np
+
+from collision import CollisionChecker
+from grid_planner import GridPlanner
+from maze_generator import generate_maze
+from path_processing import ClearanceField, optimize_path, spline_resample
+
+
+def maze_path(seed=0):
+    maze, start, goal = generate_maze(320, 240, density=0.5, seed=seed)
+    checker = CollisionChecker.from_maze(maze)
+    field = ClearanceField.from_maze(maze)
+    path = GridPlanner(maze, start, goal, collision=checker).run()
+    return optimize_path(path, field, checker), field, checker
+
+
+# distance of every point to the closest segment of the polyline
+def polyline_distance(points, polyline):
+    a, b = polyline[:-1], polyline[1:]
+    d = b - a
+    t = np.einsum("pij,ij->pi", points[:, None] - a, d) / np.einsum("ij,ij->i", d, d)
+    closest = a + np.clip(t, 0, 1)[..., None] * d
+    return np.linalg.norm(points[:, None] - closest, axis=-1).min(axis=1)
+
+
+def test_spline_resample_spacing():
+    path, field, checker = maze_path()
+    out, arc, headings = spline_resample(path, field, checker, spacing=10)
+    assert np.allclose(out[[0, -1]], path[[0, -1]])
+    assert np.all(np.diff(arc) <= 10 + 1e-9)
+    assert len(headings) == len(out)
+
+
+def test_spline_resample_falls_back_to_polyline_when_rounds_run_out():
+    path, field, checker = maze_path()
+    # no round to straighten the failing spline segments in
+    out, arc, _ = spline_resample(path, field, checker, spacing=10, rounds=0)
+    pts = np.asarray(path, dtype=float)
+    assert polyline_distance(out, pts).max() < 1e-6
+    # every corner is sampled, so no chord cuts one
+    assert polyline_distance(pts, out).max() < 1e-6
+    assert np.all(np.diff(arc) <= 10 + 1e-9)
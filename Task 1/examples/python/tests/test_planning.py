@@ -0,0 +1,22 @@
+import cv2 as cv
+import numpy as np
+
+from maze_generator import generate_maze
+from planning import WarmMap, plan_path
+
+
+def warm_maze(tmp_path, seed=0):
+    maze, start, goal = generate_maze(160, 120, density=0.2, seed=seed)
+    map_file = str(tmp_path / "maze.png")
+    cv.imwrite(map_file, maze)
+    return WarmMap(map_file, str(tmp_path / "cache"))
+
+
+def test_plan_path_cost_is_per_vertex(tmp_path):
+    result = plan_path(warm_maze(tmp_path), planner="astar")
+    assert result is not None
+    n = len(result["pixels"])
+    assert result["cost"].shape == (n,)
+    assert result["cost"][0] == 0
+    assert np.all(np.diff(result["cost"]) >= 0)
+    assert isinstance(result["best_cost"], float)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from collision import CollisionChecker
+from maze_generator import generate_maze
+from replanner import DStarLite
+
+
+# blocks the middle of the path and moves one vertex along it, three times.
+# km and the heuristic drift apart by an ulp on this maze, which used to end
+# the search with an inconsistent cell and loop forever in run()
+def test_repeated_replans_match_a_fresh_search():
+    maze, start, goal = generate_maze(320, 240, density=0.5, seed=0)
+    collision = CollisionChecker.from_maze(maze, 1)
+    occupancy = np.array(collision.occupancy)
+    planner = DStarLite(maze, start, goal, collision=collision)
+    path = planner.run()
+    for _ in range(3):
+        pts = np.asarray(path)
+        x, y = pts[len(pts) // 2]
+        occupancy[y - 6 : y + 7, x - 6 : x + 7] = True
+        planner.update_occupancy(occupancy)
+        planner.move_start(pts[1])
+        path = planner.run()
+        assert path is not None
+        assert tuple(path[-1]) == tuple(goal)
+
+        fresh = DStarLite(
+            maze, pts[1], goal, collision=CollisionChecker(occupancy.copy())
+        )
+        assert fresh.run() is not None
+        assert np.isclose(planner.best_cost(), fresh.best_cost())
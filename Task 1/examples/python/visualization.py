@@ -0,0 +1,26 @@
+import time
+import cv2 as cv
+
+
+# planner callback that draws each new tree edge onto one persistent canvas
+# and only pushes the canvas to the window every `interval` seconds
+class TreeRenderer:
+    def __init__(self, maze, interval=0.1, window="RRT* Tree", colour=(0, 0, 255)):
+        self.canvas = maze.copy()
+        self.interval = interval
+        self.window = window
+        self.colour = colour
+        self.last_shown = 0.0
+
+    def __call__(self, planner, i):
+        p = planner.parent[i]
+        if p >= 0:
+            cv.line(self.canvas, planner.node(p), planner.node(i), self.colour)
+        now = time.perf_counter()
+        if now - self.last_shown >= self.interval:
+            self.show()
+            self.last_shown = now
+
+    def show(self):
+        cv.imshow(self.window, self.canvas)
+        cv.waitKey(1)